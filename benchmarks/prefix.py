@@ -0,0 +1,70 @@
+"""
+Compares prefix resolution with PrefixMatcher against the case permutation list it replaced.
+
+Run from the repository root with ``python -m benchmarks.prefix``.
+"""
+
+from __future__ import annotations
+
+import functools
+import itertools
+import timeit
+from typing import TYPE_CHECKING
+
+from utils import PrefixMatcher
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# What commands.when_mentioned returns, discord.py tries these before the other prefixes.
+MENTIONS = ['<@1234567890> ', '<@!1234567890> ']
+BASES = ('m.', 'debot.', 'mafuyu.')
+CUSTOM_COUNTS = (0, 100)
+MESSAGES = {'command': '{base}help', 'chat': 'hello there, how is everyone doing?'}
+NUMBER = 100_000
+
+
+def permutations(base: str) -> list[str]:
+    # DeBot.prefix before the trie, every upper/lower case spelling of the base prefix.
+    return [''.join(spelling) for spelling in itertools.product(*zip(base.lower(), base.upper(), strict=True))]
+
+
+def find(prefixes: list[str], content: str) -> str | None:
+    # How commands.Bot.get_context picks the invoked prefix out of a list.
+    return next((prefix for prefix in prefixes if content.startswith(prefix)), None)
+
+
+def old_path(spellings: list[str], custom: list[str], content: str) -> str | None:
+    prefixes = spellings.copy()
+    prefixes.extend(custom)
+    return find([*MENTIONS, *prefixes], content)
+
+
+def new_path(matcher: PrefixMatcher, content: str) -> str | None:
+    prefixes = MENTIONS.copy()
+    if matched := matcher.match(content):
+        prefixes.append(matched)
+    return find(prefixes, content)
+
+
+def microseconds(func: Callable[..., str | None], *args: object) -> float:
+    timer = timeit.Timer(functools.partial(func, *args))
+    return min(timer.repeat(repeat=5, number=NUMBER)) / NUMBER * 1_000_000
+
+
+def main() -> None:
+    print(f'{"base":<10}{"custom":>8}  {"message":<9}{"old":>9}{"new":>9}')
+    for base, count, (kind, message) in itertools.product(BASES, CUSTOM_COUNTS, MESSAGES.items()):
+        custom = [f'custom{index}!' for index in range(count)]
+        content = message.format(base=base)
+        spellings = permutations(base)
+        matcher = PrefixMatcher([base, *custom])
+        assert old_path(spellings, custom, content) == new_path(matcher, content)  # noqa: S101
+
+        old = microseconds(old_path, spellings, custom, content)
+        new = microseconds(new_path, matcher, content)
+        print(f'{base!r:<10}{count:>8}  {kind:<9}{old:>7.2f}us{new:>7.2f}us')
+
+
+if __name__ == '__main__':
+    main()
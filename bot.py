@@ -1,32 +1,50 @@
 from __future__ import annotations
 
+import asyncio
 import configparser
 import datetime
 import functools
 import logging
-from itertools import product
-from pathlib import Path
+import time
 from pkgutil import iter_modules
-from typing import TYPE_CHECKING, Any, ClassVar, Literal, Self, overload
+from typing import TYPE_CHECKING, ClassVar, Literal, Self, overload
 
 import aiohttp
 import asyncpg
 import discord
 import jishaku
 import mystbin
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from utils import (
     BASE_PREFIX,
+    CONFIG_PATH,
     DESCRIPTION,
+    MIGRATIONS_PATH,
     OWNERS_ID,
     THEME_COLOUR,
     Blacklist,
+    BotMetrics,
+    ColourExtractor,
+    Config,
+    Database,
     DeContext,
+    ErrorReporter,
+    HTTPClient,
+    Leaderboard,
+    LogShipper,
+    MetricsServer,
     PrefixAlreadyPresentError,
+    PrefixMatcher,
     PrefixNotInitialisedError,
     PrefixNotPresentError,
+    Queries,
     UnderMaintenanceError,
+    VoteBuffer,
+    WebhookQueue,
+    apply_migrations,
+    better_string,
+    load_migrations,
 )
 
 if TYPE_CHECKING:
@@ -45,18 +63,31 @@ jishaku.Flags.NO_UNDERSCORE = True
 
 EXTERNAL_COGS: list[str] = ['jishaku']
 
+# Extensions that nothing needs before the bot is ready.
+DEFERRED_COGS: frozenset[str] = frozenset({'cogs.meta'})
+
 
 class DeBot(commands.Bot):
-    prefix: ClassVar[list[str]] = [
-        ''.join(capitalization) for capitalization in product(*zip(BASE_PREFIX.lower(), BASE_PREFIX.upper(), strict=False))
-    ]
+    prefix: ClassVar[PrefixMatcher] = PrefixMatcher([BASE_PREFIX])
     colour: discord.Colour = THEME_COLOUR
     session: aiohttp.ClientSession
+    web: HTTPClient
+    colours: ColourExtractor
     if TYPE_CHECKING:
         pool: asyncpg.Pool[asyncpg.Record]
+    db: Database
+    votes: VoteBuffer
+    leaderboard: Leaderboard
     mystbin_cli: mystbin.Client
+    webhooks: WebhookQueue
+    errors: ErrorReporter
+    log_shipper: LogShipper
+    metrics: BotMetrics
+    metrics_server: MetricsServer | None
+    config: Config
     load_time: datetime.datetime
     prefixes: dict[int, list[str]]
+    prefix_matchers: dict[int, PrefixMatcher]
     blacklist: Blacklist
     maintenance: bool
     appinfo: discord.AppInfo
@@ -73,44 +104,58 @@ class DeBot(commands.Bot):
             max_messages=5000,
             allowed_mentions=discord.AllowedMentions(everyone=False, users=True, roles=False, replied_user=True),
         )
-        self.token = str(self.config.get('bot', 'token'))
-        self.session = aiohttp.ClientSession()
+        self.config = Config.from_file(CONFIG_PATH)
+        self.token = self.config.bot.token
+        # Only used for Discord webhooks, image APIs go through self.web.
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
         self.mystbin_cli = mystbin.Client()
+        self.webhooks = WebhookQueue(lambda: self.logger_webhook)
+        self.errors = ErrorReporter(self.webhooks, self.mystbin_cli)
+        self.log_shipper = LogShipper(self.webhooks)
+        self.metrics = BotMetrics()
+        self.metrics.collectors.append(functools.partial(self.metrics.collect, self))
+        self.metrics_server = None
         self.load_time = datetime.datetime.now(tz=datetime.UTC)
         self.prefixes: dict[int, list[str]] = {}
+        self.prefix_matchers: dict[int, PrefixMatcher] = {}
         self.blacklist = Blacklist(self)
         self.maintenance = False
         self.check_once(self.check_maintenance)
 
     @discord.utils.copy_doc(commands.Bot.get_prefix)
     async def get_prefix(self, message: discord.Message) -> list[str]:
-        prefixes = self.prefix.copy()
-        if message.guild is None:
-            return commands.when_mentioned_or(*prefixes)(self, message)
-
-        if self.prefixes.get(message.guild.id):
-            prefixes.extend(self.prefixes[message.guild.id])
-            return commands.when_mentioned_or(*prefixes)(self, message)
-
-        fetched_prefix: list[str] = await self.pool.fetchval(
-            """SELECT array_agg(prefix) FROM prefixes WHERE guild = $1""",
-            (message.guild.id),
-        )
-        if fetched_prefix:
-            self.prefixes[message.guild.id] = fetched_prefix
-            prefixes.extend(self.prefixes[message.guild.id])
-
-        return commands.when_mentioned_or(*prefixes)(self, message)
+        prefixes = commands.when_mentioned(self, message)
+        matcher = self.prefix
+        if message.guild is not None:
+            # Every guild with custom prefixes is loaded in setup_hook, so a miss here means the guild has none.
+            matcher = self.prefix_matchers.get(message.guild.id, self.prefix)
+            self.metrics.prefix_lookups.inc('miss' if matcher is self.prefix else 'hit')
+
+        matched = matcher.match(message.content)
+        if matched:
+            prefixes.append(matched)
+        return prefixes
+
+    async def load_prefixes(self) -> dict[int, list[str]]:
+        records = await self.db.fetch(Queries.PREFIXES)
+        self.prefixes = {record['guild']: list(record['prefixes']) for record in records}
+        self.prefix_matchers = {guild: self.prefix.extend(prefixes) for guild, prefixes in self.prefixes.items()}
+        return self.prefixes
+
+    def _rebuild_prefix_matcher(self, guild_id: int) -> None:
+        prefixes = self.prefixes.get(guild_id)
+        if prefixes:
+            self.prefix_matchers[guild_id] = self.prefix.extend(prefixes)
+        else:
+            self.prefix_matchers.pop(guild_id, None)
 
     async def add_prefix(self, guild: discord.Guild, prefix: str) -> list[str]:
         if prefix in self.prefix:
             raise PrefixAlreadyPresentError(prefix)
 
-        await self.pool.execute("""INSERT INTO Prefixes VALUES ($1, $2)""", guild.id, prefix)
-        if not self.prefixes.get(guild.id):
-            self.prefixes[guild.id] = [prefix]
-            return self.prefixes[guild.id]
-        self.prefixes[guild.id].append(prefix)
+        await self.db.execute(Queries.ADD_PREFIX, guild.id, prefix)
+        self.prefixes.setdefault(guild.id, []).append(prefix)
+        self._rebuild_prefix_matcher(guild.id)
 
         return self.prefixes[guild.id]
 
@@ -121,24 +166,43 @@ class DeBot(commands.Bot):
         if prefix not in self.prefixes[guild.id]:
             raise PrefixNotPresentError(prefix, guild)
 
-        await self.pool.execute(
-            """DELETE FROM Prefixes WHERE guild = $1 AND prefix = $2""",
-            guild.id,
-            prefix,
-        )
+        await self.db.execute(Queries.REMOVE_PREFIX, guild.id, prefix)
         self.prefixes[guild.id].remove(prefix)
         if not self.prefixes[guild.id]:
             self.prefixes.pop(guild.id)
-            return None
-        return self.prefixes[guild.id]
+        self._rebuild_prefix_matcher(guild.id)
+        return self.prefixes.get(guild.id)
 
     async def clear_prefix(self, guild: discord.Guild) -> None:
         if not self.prefixes.get(guild.id):
             raise PrefixNotInitialisedError(guild)
 
-        await self.pool.execute("""DELETE FROM Prefixes WHERE guild = $1""", guild.id)
+        await self.db.execute(Queries.CLEAR_PREFIXES, guild.id)
 
         self.prefixes.pop(guild.id)
+        self._rebuild_prefix_matcher(guild.id)
+
+    def should_dispatch(self, message: discord.Message) -> bool:
+        """
+        Whether a message could run a command at all.
+
+        This mirrors the blacklist and maintenance checks using only integer lookups, and runs before
+        get_prefix and get_context so that rejected messages cost next to nothing. The checks themselves
+        stay in place for application commands, which never go through process_commands.
+        """
+        if message.author.id in self.blacklist.users or (
+            message.guild is not None and message.guild.id in self.blacklist.guilds
+        ):
+            self.metrics.blacklist_lookups.inc('hit')
+            return False
+        self.metrics.blacklist_lookups.inc('miss')
+        return not self.maintenance or message.author.id in OWNERS_ID
+
+    @discord.utils.copy_doc(commands.Bot.process_commands)
+    async def process_commands(self, message: discord.Message, /) -> None:
+        if message.author.bot or not self.should_dispatch(message):
+            return
+        await super().process_commands(message)
 
     async def check_maintenance(self, ctx: commands.Context[Self]) -> Literal[True]:
         if self.maintenance is True and not await self.is_owner(ctx.author):
@@ -146,37 +210,76 @@ class DeBot(commands.Bot):
         return True
 
     async def setup_hook(self) -> None:
-        credentials: dict[str, Any] = {
-            'user': str(self.config.get('database', 'user')),
-            'password': str(self.config.get('database', 'password')),
-            'database': str(self.config.get('database', 'database')),
-            'host': str(self.config.get('database', 'host')),
-            'port': str(self.config.get('database', 'port')),
-        }
-        pool: asyncpg.Pool[asyncpg.Record] | None = await asyncpg.create_pool(**credentials)
-        if not pool or (pool and pool.is_closing()):
-            msg = 'Pool is closed'
-            raise RuntimeError(msg)
-        self.pool = pool
-
-        with Path('schema.sql').open(encoding='utf-8') as f:  # noqa: ASYNC230
-            await self.pool.execute(f.read())
+        self.webhooks.start()
+        self.errors.start()
+        self.log_shipper.start()
+
+        # Migrations run on their own connection, before the pool prepares statements against the tables,
+        # and without the pool's statement timeout so that long index builds aren't cut short.
+        migrations = await asyncio.to_thread(load_migrations, MIGRATIONS_PATH)
+        conn: asyncpg.Connection[asyncpg.Record] = await asyncpg.connect(**self.config.database.credentials)
+        try:
+            applied = await apply_migrations(conn, migrations)
+        finally:
+            await conn.close()
+        self.log.info('Applied %s new migration(s) out of %s', len(applied), len(migrations))
+
+        self.db = await Database.connect(self.config.database)
+        self.pool = self.db.pool
+        self.leaderboard = Leaderboard(self.db)
+        await self.leaderboard.load()
+        self.votes = VoteBuffer(self.db, self.leaderboard, interval=self.config.votes.flush_interval)
+        self.votes.start()
+        self.web = HTTPClient()
+        self.colours = ColourExtractor(self.web, self.db)
+
+        await self.load_prefixes()
+        self.log.info('Loaded custom prefixes for %s guilds', len(self.prefixes))
+        await self.blacklist.load()
+        self.log.info('Loaded %s blacklist entries', len(self.blacklist.blacklists))
 
         self.appinfo = await self.application_info()
+        self.watch_config.start()
+
+        if port := self.config.metrics.port:
+            self.metrics_server = MetricsServer(self.metrics, host=self.config.metrics.host, port=port)
+            await self.metrics_server.start()
+            self.log.info('Serving metrics on %s:%s', self.config.metrics.host, port)
 
         cogs = [m.name for m in iter_modules(['cogs'], prefix='cogs.')]
         cogs.extend(EXTERNAL_COGS)
-        for cog in cogs:
-            try:
-                await self.load_extension(str(cog))
-            except commands.ExtensionError as error:
-                self.log.exception(
-                    'Ignoring exception in loading %s',
-                    cog,
-                    exc_info=error,
-                )
-            else:
-                self.log.info('Loaded %s ', cog)
+        await self.load_extensions([cog for cog in cogs if cog not in DEFERRED_COGS])
+        self._deferred_cogs_task = asyncio.create_task(
+            self.load_deferred_extensions([cog for cog in cogs if cog in DEFERRED_COGS])
+        )
+
+    async def load_extensions(self, extensions: list[str]) -> None:
+        """Load independent extensions concurrently and log how long each took to load."""
+        start = time.perf_counter()
+        timings = await asyncio.gather(*(self._load_extension_timed(extension) for extension in extensions))
+        report = better_string(
+            (
+                f'  {extension:<20} {timing * 1000:>8.2f}ms'
+                for extension, timing in zip(extensions, timings, strict=True)
+                if timing is not None
+            ),
+            seperator='\n',
+        )
+        self.log.info('Loaded %s extension(s) in %.2fms\n%s', len(extensions), (time.perf_counter() - start) * 1000, report)
+
+    async def _load_extension_timed(self, extension: str) -> float | None:
+        # Covers the import and setup together, load_extension executes the module itself on every load.
+        start = time.perf_counter()
+        try:
+            await self.load_extension(extension)
+        except commands.ExtensionError as error:
+            self.log.exception('Ignoring exception in loading %s', extension, exc_info=error)
+            return None
+        return time.perf_counter() - start
+
+    async def load_deferred_extensions(self, extensions: list[str]) -> None:
+        await self.wait_until_ready()
+        await self.load_extensions(extensions)
 
     @overload
     async def get_context(self, origin: discord.Interaction | discord.Message, /) -> DeContext: ...
@@ -195,11 +298,27 @@ class DeBot(commands.Bot):
             cls = DeContext  # pyright: ignore[reportAssignmentType]
         return await super().get_context(origin, cls=cls)
 
-    @property
-    def config(self) -> configparser.ConfigParser:
-        config = configparser.ConfigParser()
-        config.read('config.ini')
-        return config
+    async def reload_config(self, *, force: bool = False) -> bool:
+        """Re-read ``config.ini`` off the event loop if it changed, returning whether a new config was swapped in."""
+        path = self.config.path
+        if not force:
+            mtime_ns = (await asyncio.to_thread(path.stat)).st_mtime_ns
+            if mtime_ns == self.config.mtime_ns:
+                return False
+
+        self.config = await asyncio.to_thread(Config.from_file, path)
+        self.__dict__.pop('logger_webhook', None)
+        return True
+
+    @tasks.loop(seconds=30)
+    async def watch_config(self) -> None:
+        try:
+            reloaded = await self.reload_config()
+        except (OSError, ValueError, configparser.Error):
+            self.log.exception('Failed to reload %s, keeping the previous config', self.config.path)
+        else:
+            if reloaded:
+                self.log.info('Reloaded %s', self.config.path)
 
     @discord.utils.copy_doc(commands.Bot.is_owner)
     async def is_owner(self, user: discord.abc.User) -> bool:
@@ -207,7 +326,7 @@ class DeBot(commands.Bot):
 
     @functools.cached_property
     def logger_webhook(self) -> discord.Webhook:
-        return discord.Webhook.from_url(str(self.config.get('bot', 'webhook')), session=self.session, bot_token=self.token)
+        return discord.Webhook.from_url(self.config.bot.webhook, session=self.session, bot_token=self.token)
 
     @property
     def guild(self) -> discord.Guild:
@@ -226,8 +345,28 @@ class DeBot(commands.Bot):
         return user
 
     async def close(self) -> None:
-        if hasattr(self, 'pool'):
-            await self.pool.close()
+        self.watch_config.cancel()
+        if self.metrics_server:
+            await self.metrics_server.close()
+        # commands.Bot.close would only unload them after the pool is gone, and they write their state out on unload.
+        for extension in tuple(self.extensions):
+            try:
+                await self.unload_extension(extension)
+            except Exception:
+                self.log.exception('Failed to unload %s on shutdown', extension)
+        self.blacklist.close()
+        if hasattr(self, 'votes'):
+            await self.votes.close()
+        if hasattr(self, 'db'):
+            await self.db.close()
+        if hasattr(self, 'colours'):
+            self.colours.close()
+        if hasattr(self, 'web'):
+            await self.web.close()
+        # The last digest goes out through the session, so both have to finish before it closes.
+        await self.errors.close()
+        await self.log_shipper.close()
+        await self.webhooks.close()
         if hasattr(self, 'session'):
             await self.session.close()
         await super().close()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import array
+import asyncio
+import bisect
+import collections
+import datetime
+import logging
+from typing import TYPE_CHECKING, Any, cast
+
+import asyncpg
+from cachetools import LRUCache
+from discord.ext import tasks
+from fuzzywuzzy import fuzz  # pyright: ignore[reportMissingTypeStubs]
+
+from utils import UPSTREAM_ERRORS, Queries
+
+from .tags import CHARACTER_ID, Tag
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from utils import Database, HTTPClient
+
+__all__ = ('CharacterIndex',)
+
+log = logging.getLogger(__name__)
+
+# Danbooru serves at most this many tags per page. The most used characters come first.
+PAGE_SIZE = 1000
+MAX_PAGES = 30
+REFRESH_AFTER = datetime.timedelta(days=1)
+# Short queries match a large part of the index, only this many entries are looked at for them.
+MAX_SCAN = 5000
+FUZZY_CANDIDATES = 50
+FUZZY_CUTOFF = 60
+
+ratio = cast('Callable[[str, str], int]', fuzz.WRatio)  # pyright: ignore[reportUnknownMemberType]
+
+
+def build_keys(post_counts: dict[str, int]) -> list[tuple[str, str]]:
+    # Every tag is reachable from each of its words, so "miku" finds "hatsune_miku".
+    keys: list[tuple[str, str]] = []
+    for name in post_counts:
+        words = name.split('_')
+        keys.extend(('_'.join(words[start:]), name) for start in range(len(words)))
+    keys.sort()
+    return keys
+
+
+def trigrams(text: str) -> set[str]:
+    # Padded like pg_trgm, so that the start of each word counts for more.
+    padded = f'  {text.replace("_", "  ")} '
+    return {padded[start : start + 3] for start in range(len(padded) - 2)}
+
+
+def build_trigrams(names: list[str]) -> dict[str, array.array[int]]:
+    # Trigram -> positions in names. Arrays of unsigned ints are a fraction of the size of lists of ints.
+    postings: dict[str, list[int]] = collections.defaultdict(list)
+    for position, name in enumerate(names):
+        for trigram in trigrams(name):
+            postings[trigram].append(position)
+    return {trigram: array.array('I', positions) for trigram, positions in postings.items()}
+
+
+class CharacterIndex:
+    """
+    Danbooru character tags, kept in ``CharacterTags`` and mirrored in memory for prefix lookups.
+
+    Queries without a prefix match fall back to the names sharing the most trigrams with them, ranked with fuzzywuzzy.
+    """
+
+    def __init__(self, db: Database, web: HTTPClient) -> None:
+        self.db = db
+        self.web = web
+        self.post_counts: dict[str, int] = {}
+        # Sorted (word suffix, tag name) pairs.
+        self.keys: list[tuple[str, str]] = []
+        # Most used first, so that ties in the fuzzy search go to the better known character.
+        self.names: list[str] = []
+        self.trigrams: dict[str, array.array[int]] = {}
+        # Autocomplete asks again on every keystroke, fuzzy results are kept until the next load.
+        self._fuzzy: LRUCache[tuple[str, int], list[Tag]] = LRUCache(maxsize=1024)
+
+    def __len__(self) -> int:
+        return len(self.post_counts)
+
+    def tag(self, name: str) -> Tag:
+        return Tag(label=name.replace('_', ' '), value=name, category=CHARACTER_ID, antecedent=None)
+
+    def prefix(self, query: str, *, limit: int) -> list[Tag]:
+        keys = self.keys
+        matches: set[str] = set()
+        start = bisect.bisect_left(keys, (query,))
+        for index in range(start, min(start + MAX_SCAN, len(keys))):
+            key, name = keys[index]
+            if not key.startswith(query):
+                break
+            matches.add(name)
+
+        ranked = sorted(matches, key=lambda name: (-self.post_counts[name], name))
+        return [self.tag(name) for name in ranked[:limit]]
+
+    def fuzzy(self, query: str, *, limit: int) -> list[Tag]:
+        if (tags := self._fuzzy.get((query, limit))) is not None:
+            return tags
+
+        shared: collections.Counter[int] = collections.Counter()
+        for trigram in trigrams(query):
+            shared.update(self.trigrams.get(trigram, ()))
+        candidates = [self.names[position] for position, _ in shared.most_common(FUZZY_CANDIDATES)]
+        # Scored as words, so that "reimu hakurei" still finds "hakurei_reimu".
+        words = query.replace('_', ' ')
+        scores = {name: ratio(words, name.replace('_', ' ')) for name in candidates}
+        ranked = sorted(
+            (name for name, score in scores.items() if score >= FUZZY_CUTOFF), key=scores.__getitem__, reverse=True
+        )
+        tags = self._fuzzy[query, limit] = [self.tag(name) for name in ranked[:limit]]
+        return tags
+
+    def search(self, query: str, *, limit: int = 25) -> list[Tag]:
+        if not query or not self.post_counts:
+            return []
+        return self.prefix(query, limit=limit) or self.fuzzy(query, limit=limit)
+
+    async def load(self) -> None:
+        records = await self.db.fetch(Queries.CHARACTER_TAGS)
+        post_counts = {record['name']: record['post_count'] for record in records}
+        names = sorted(post_counts, key=post_counts.__getitem__, reverse=True)
+        keys = await asyncio.to_thread(build_keys, post_counts)
+        index = await asyncio.to_thread(build_trigrams, names)
+        self.post_counts, self.keys, self.names, self.trigrams = post_counts, keys, names, index
+        self._fuzzy.clear()
+        log.info('Loaded %s character tags', len(post_counts))
+
+    async def refresh(self) -> None:
+        post_counts: dict[str, int] = {}
+        for page in range(1, MAX_PAGES + 1):
+            async with self.web.get(
+                'danbooru',
+                '/tags.json',
+                params={
+                    'search[category]': CHARACTER_ID,
+                    'search[order]': 'count',
+                    'search[hide_empty]': 'true',
+                    'limit': PAGE_SIZE,
+                    'page': page,
+                },
+            ) as req:
+                req.raise_for_status()
+                data: list[dict[str, Any]] = await req.json()
+            post_counts.update((tag['name'], tag['post_count']) for tag in data)
+            if len(data) < PAGE_SIZE:
+                break
+
+        names = list(post_counts)
+        await self.db.execute(Queries.UPSERT_CHARACTER_TAGS, names, [post_counts[name] for name in names])
+        await self.load()
+
+    @tasks.loop(hours=6)
+    async def refresh_loop(self) -> None:
+        try:
+            if not self.post_counts:
+                await self.load()
+            refreshed_at: datetime.datetime | None = await self.db.fetchval(Queries.CHARACTER_TAGS_REFRESHED)
+            # Timestamps are stored as naive UTC.
+            stale_before = (datetime.datetime.now(datetime.UTC) - REFRESH_AFTER).replace(tzinfo=None)
+            if refreshed_at is None or refreshed_at < stale_before:
+                await self.refresh()
+        except (*UPSTREAM_ERRORS, OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            log.exception('Failed to refresh the character tag index')
+
+    def start(self) -> None:
+        self.refresh_loop.start()
+
+    def close(self) -> None:
+        self.refresh_loop.cancel()
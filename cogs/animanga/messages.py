@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import datetime
+import logging
+from typing import TYPE_CHECKING, Any, Self
+
+import asyncpg
+import discord
+from cachetools import LRUCache
+from discord.ext import tasks
+
+from utils import Queries
+
+if TYPE_CHECKING:
+    from bot import DeBot
+    from utils import Database, WaifuResult
+
+__all__ = ('SmashOrPassMessage', 'SmashOrPassMessages')
+
+log = logging.getLogger(__name__)
+
+# Buttons on messages nobody has touched for this long stop working.
+EXPIRE_AFTER = datetime.timedelta(days=30)
+
+
+@dataclasses.dataclass(slots=True, eq=False)
+class SmashOrPassMessage:
+    """What a smash or pass message shows, with voters kept as plain user IDs the way they are stored."""
+
+    message_id: int
+    owner_id: int
+    source: str
+    nsfw: bool
+    query: str | None
+    image_id: int = 0
+    url: str = ''
+    page: str | None = None
+    colour: int | None = None
+    smashers: list[int] = dataclasses.field(default_factory=list[int])
+    passers: list[int] = dataclasses.field(default_factory=list[int])
+
+    # Coalesced edits, never stored.
+    pending: discord.Interaction[DeBot] | None = None
+    renderer: asyncio.Task[None] | None = None
+    last_render: float = 0.0
+    # Held while the message is being edited, so that a coalesced edit can't land after the image changed.
+    editing: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock)
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> Self:
+        return cls(**dict(record.items()))
+
+    def show(self, image: WaifuResult) -> None:
+        self.image_id = int(image.image_id)
+        self.url = image.url
+        self.page = image.source
+        self.colour = discord.Colour.from_str(image.dominant_color).value if image.dominant_color else None
+        self.smashers = []
+        self.passers = []
+
+    def row(self) -> tuple[Any, ...]:
+        # Copies the voters, they may change while the row is being written.
+        return (
+            self.message_id,
+            self.owner_id,
+            self.source,
+            self.nsfw,
+            self.query,
+            self.image_id,
+            self.url,
+            self.page,
+            self.colour,
+            list(self.smashers),
+            list(self.passers),
+        )
+
+
+class SmashOrPassMessages:
+    """
+    Vote state of smash or pass messages, kept in ``SmashOrPassMessages`` so that their buttons outlive the process.
+
+    Recently used messages are cached and changes are written behind in one batch per flush interval,
+    so a hard crash loses at most one interval of votes, same as :class:`utils.VoteBuffer`.
+    """
+
+    def __init__(self, db: Database, *, interval: float, maxsize: int = 1024) -> None:
+        self.db = db
+        self.cache: LRUCache[int, SmashOrPassMessage] = LRUCache(maxsize=maxsize)
+        # Changed since the last flush. Kept here until written even if they fall out of the cache.
+        self.dirty: dict[int, SmashOrPassMessage] = {}
+        self._loading: dict[int, asyncio.Task[SmashOrPassMessage | None]] = {}
+        # Held for the whole write, see VoteBuffer.
+        self._lock = asyncio.Lock()
+        self.flush_loop.change_interval(seconds=interval)
+
+    def add(self, message: SmashOrPassMessage) -> None:
+        self.cache[message.message_id] = message
+        self.changed(message)
+
+    def changed(self, message: SmashOrPassMessage) -> None:
+        self.dirty[message.message_id] = message
+
+    async def get(self, message_id: int) -> SmashOrPassMessage | None:
+        message = self.dirty.get(message_id) or self.cache.get(message_id)
+        if message is not None:
+            return message
+
+        task = self._loading.get(message_id)
+        if task is None:
+            task = self._loading[message_id] = asyncio.create_task(self._load(message_id))
+            task.add_done_callback(lambda _: self._loading.pop(message_id, None))
+        # A burst of clicks on a message that isn't cached shares one query.
+        return await asyncio.shield(task)
+
+    async def _load(self, message_id: int) -> SmashOrPassMessage | None:
+        record = await self.db.fetchrow(Queries.SMASH_OR_PASS_MESSAGE, message_id)
+        if record is None:
+            return None
+        message = self.cache[message_id] = SmashOrPassMessage.from_record(record)
+        return message
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self.dirty:
+                return 0
+
+            dirty, self.dirty = self.dirty, {}
+            try:
+                await self.db.executemany(
+                    Queries.UPSERT_SMASH_OR_PASS_MESSAGE, [message.row() for message in dirty.values()]
+                )
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                # Messages changed again in the meantime are already back in dirty, and they are the same objects.
+                for message_id, message in dirty.items():
+                    self.dirty.setdefault(message_id, message)
+                raise
+            return len(dirty)
+
+    @tasks.loop(seconds=10)
+    async def flush_loop(self) -> None:
+        try:
+            await self.flush()
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            log.exception('Failed to flush %s smash or pass messages, retrying on the next tick', len(self.dirty))
+
+    @tasks.loop(hours=24)
+    async def purge_loop(self) -> None:
+        try:
+            await self.db.execute(Queries.PURGE_SMASH_OR_PASS_MESSAGES, EXPIRE_AFTER)
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            log.exception('Failed to purge expired smash or pass messages')
+
+    def start(self) -> None:
+        self.flush_loop.start()
+        self.purge_loop.start()
+
+    async def close(self) -> None:
+        async with self._lock:
+            self.flush_loop.cancel()
+        self.purge_loop.cancel()
+        for task in self._loading.values():
+            task.cancel()
+        for message in (*self.cache.values(), *self.dirty.values()):
+            if message.renderer:
+                message.renderer.cancel()
+        try:
+            await self.flush()
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            log.exception('Dropping %s smash or pass messages on shutdown', len(self.dirty))
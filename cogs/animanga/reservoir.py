@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import random
+from typing import TYPE_CHECKING
+
+from cachetools import LRUCache
+
+from utils import UPSTREAM_ERRORS, WaifuNotFoundError
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Hashable
+
+    from utils import WaifuResult
+
+__all__ = ('Reservoir', 'Reservoirs')
+
+log = logging.getLogger(__name__)
+
+# Refill once fewer than this many images are left, so views rarely find the reservoir empty.
+LOW_WATERMARK = 5
+RECENT_SIZE = 50
+
+
+class Reservoir:
+    """
+    Images for one source, rating and tag, shared by every view that shows them.
+
+    Refills happen in the background with one bulk upstream query each.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[list[WaifuResult]]], *, low_watermark: int = LOW_WATERMARK) -> None:
+        self.fetch = fetch
+        self.low_watermark = low_watermark
+        self.images: collections.deque[WaifuResult] = collections.deque()
+        self.recent: collections.deque[WaifuResult] = collections.deque(maxlen=RECENT_SIZE)
+        self._refill: asyncio.Task[int] | None = None
+
+    async def get(self) -> WaifuResult:
+        while not self.images:
+            try:
+                # Shielded so that one impatient caller can't cancel a refill others are waiting on.
+                fresh = await asyncio.shield(self.refill())
+            except (*UPSTREAM_ERRORS, KeyError):
+                # Repeating something shown recently beats failing while the upstream is down.
+                if self.recent:
+                    return random.choice(self.recent)  # noqa: S311
+                raise
+            if not fresh and not self.images:
+                raise WaifuNotFoundError
+
+        image = self.images.popleft()
+        self.recent.append(image)
+        if len(self.images) < self.low_watermark:
+            self.refill()
+        return image
+
+    def refill(self) -> asyncio.Task[int]:
+        if self._refill is None or self._refill.done():
+            self._refill = asyncio.create_task(self._fill())
+            self._refill.add_done_callback(self._log_failure)
+        return self._refill
+
+    async def _fill(self) -> int:
+        batch = await self.fetch()
+        queued = {image.image_id for image in self.images}
+        fresh = [image for image in batch if image.image_id not in queued]
+        self.images.extend(fresh)
+        return len(fresh)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task[int]) -> None:
+        if not task.cancelled() and (error := task.exception()):
+            log.debug('Reservoir refill failed', exc_info=error)
+
+    def close(self) -> None:
+        if self._refill:
+            self._refill.cancel()
+
+
+class Reservoirs:
+    """A bounded set of reservoirs, the least recently used one is dropped to make room for new tags."""
+
+    def __init__(self, *, maxsize: int = 256) -> None:
+        self._reservoirs: LRUCache[Hashable, Reservoir] = LRUCache(maxsize=maxsize)
+
+    def get(self, key: Hashable, fetch: Callable[[], Awaitable[list[WaifuResult]]]) -> Reservoir:
+        reservoir = self._reservoirs.get(key)
+        if reservoir is None:
+            reservoir = self._reservoirs[key] = Reservoir(fetch)
+        return reservoir
+
+    def close(self) -> None:
+        for reservoir in self._reservoirs.values():
+            reservoir.close()
+        self._reservoirs.clear()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from cachetools import LRUCache, TTLCache
+
+if TYPE_CHECKING:
+    from utils import HTTPClient
+
+__all__ = ('Tag', 'TagCache')
+
+CHARACTER_ID = 4
+# Danbooru's own cap on autocomplete results. A response shorter than this holds every tag starting with the query.
+AUTOCOMPLETE_LIMIT = 20
+DEBOUNCE = 0.2
+
+
+class Tag(NamedTuple):
+    label: str
+    value: str
+    category: int
+    antecedent: str | None
+
+    def matches(self, query: str) -> bool:
+        return self.value.startswith(query) or (self.antecedent is not None and self.antecedent.startswith(query))
+
+
+class Lookup(NamedTuple):
+    tags: list[Tag]
+    complete: bool
+
+
+class TagCache:
+    """
+    Caches danbooru tag autocomplete lookups.
+
+    A query is answered from the cache when possible, then from the complete results of a shorter query it extends,
+    and only then from the network. Identical lookups that are in flight share a single request.
+    """
+
+    def __init__(self, web: HTTPClient, *, maxsize: int = 2048, ttl: float = 600.0) -> None:
+        self.web = web
+        self._cache: TTLCache[str, Lookup] = TTLCache(maxsize=maxsize, ttl=ttl, timer=time.monotonic)
+        self._inflight: dict[str, asyncio.Task[Lookup]] = {}
+        # User ID -> the newest autocomplete interaction they sent.
+        self._latest: LRUCache[int, int] = LRUCache(maxsize=4096)
+
+    @staticmethod
+    def normalise(query: str) -> str:
+        return query.strip().lower().replace(' ', '_')
+
+    def cached(self, query: str) -> list[Tag] | None:
+        if (lookup := self._cache.get(query)) is not None:
+            return lookup.tags
+
+        for end in range(len(query) - 1, 0, -1):
+            lookup = self._cache.get(query[:end])
+            if lookup is None:
+                continue
+            if not lookup.complete:
+                return None
+            tags = [tag for tag in lookup.tags if tag.matches(query)]
+            # Danbooru falls back to fuzzy matches when nothing starts with the query, so an empty filter isn't an answer.
+            if not tags:
+                return None
+            self._cache[query] = Lookup(tags, complete=True)
+            return tags
+        return None
+
+    async def search(self, query: str) -> list[Tag]:
+        query = self.normalise(query)
+        if not query:
+            return []
+
+        if (tags := self.cached(query)) is not None:
+            return tags
+
+        task = self._inflight.get(query)
+        if task is None:
+            task = self._inflight[query] = asyncio.create_task(self._fetch(query))
+            task.add_done_callback(lambda _: self._inflight.pop(query, None))
+        # Shielded so that a cancelled caller doesn't take the request away from everyone else waiting on it.
+        return (await asyncio.shield(task)).tags
+
+    async def characters(self, query: str) -> list[Tag]:
+        return [tag for tag in await self.search(query) if tag.category == CHARACTER_ID]
+
+    async def autocomplete(self, user_id: int, interaction_id: int, query: str) -> list[Tag]:
+        # Interaction IDs are snowflakes, so a larger one is a later keystroke.
+        self._latest[user_id] = max(interaction_id, self._latest.get(user_id, 0))
+
+        if self.cached(self.normalise(query)) is None:
+            # Give the next keystroke a moment to arrive so that only the query the user settles on reaches danbooru.
+            await asyncio.sleep(DEBOUNCE)
+            if self._latest.get(user_id, 0) > interaction_id:
+                return []
+
+        tags = await self.characters(query)
+        return [] if self._latest.get(user_id, 0) > interaction_id else tags
+
+    async def _fetch(self, query: str) -> Lookup:
+        async with self.web.hedged_get(
+            ('safebooru', 'danbooru'),
+            '/autocomplete.json',
+            params={
+                'search[query]': query,
+                'search[type]': 'tag_query',
+                'limit': AUTOCOMPLETE_LIMIT,
+            },
+        ) as req:
+            data: list[dict[str, Any]] | dict[str, Any] = await req.json()
+        success = 200
+        if req.status != success or isinstance(data, dict):
+            return Lookup([], complete=False)
+
+        tags = [
+            Tag(
+                label=str(obj['label']),
+                value=str(obj['value']),
+                category=obj.get('category', -1),
+                antecedent=obj.get('antecedent'),
+            )
+            for obj in data
+        ]
+        lookup = Lookup(tags, complete=len(tags) < AUTOCOMPLETE_LIMIT)
+        self._cache[query] = lookup
+        return lookup
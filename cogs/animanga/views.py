@@ -1,280 +1,369 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Self
+import asyncio
+import datetime
+import logging
+import time
+from typing import TYPE_CHECKING, Any, ClassVar, Self
 
+import asyncpg
 import discord
 from asyncpg.exceptions import UniqueViolationError
 
-from utils import BaseView, DeContext, Embed, WaifuNotFoundError, WaifuResult, better_string
+from utils import (
+    DeContext,
+    Embed,
+    KeysetPaginator,
+    Queries,
+    UpstreamBusyError,
+    WaifuNotFoundError,
+    WaifuResult,
+    better_string,
+    bind_requester,
+    report_interaction_error,
+)
 
 if TYPE_CHECKING:
-    from aiohttp import ClientSession
+    import re
+    from collections.abc import Awaitable, Callable
 
     from bot import DeBot
+    from utils import Database
+
+    from .messages import SmashOrPassMessage
+    from .waifu import Waifu
 
 
 __all__ = (
-    'SafebooruPokemonView',
-    'WaifuSearchView',
-    'WaifuView',
+    'BATCHES',
+    'FavouritesPaginator',
+    'SmashOrPassButton',
+    'smash_or_pass_controls',
+    'smash_or_pass_embed',
 )
 
+log = logging.getLogger(__name__)
+
+# Posts asked for per danbooru request when refilling a reservoir.
+BATCH_SIZE = 30
+
+BLUSH_EMOJI = '<:MafuyuBlush:1314149745794617365>'
+UNAMUSED_EMOJI = '<:MafuyuUnamused:1314149535043293215>'
+BUTTONS = {
+    'smash': (BLUSH_EMOJI, discord.ButtonStyle.green),
+    'pass': (UNAMUSED_EMOJI, discord.ButtonStyle.red),
+    'next': ('🔁', discord.ButtonStyle.grey),
+}
+
+
+def smash_or_pass_embed(
+    bot: DeBot,
+    message: SmashOrPassMessage,
+    *,
+    ctx: DeContext | None = None,
+    previous: discord.Message | None = None,
+) -> discord.Embed:
+    smasher = better_string([f'<@{user_id}>' for user_id in message.smashers], seperator=', ') or discord.utils.MISSING
+    passer = better_string([f'<@{user_id}>' for user_id in message.passers], seperator=', ') or discord.utils.MISSING
+    if message.colour is None:
+        # Worked out in the background, so it only shows up once the embed is next edited.
+        message.colour = bot.colours.get(message.source, message.image_id)
+
+    embed = Embed(
+        title='Smash or Pass',
+        description=better_string(
+            [
+                (f'> [#{message.image_id}]({message.page})' if message.image_id and message.page else None),
+                f'- {BLUSH_EMOJI} **Smashers:** {smasher}',
+                f'- {UNAMUSED_EMOJI} **Passers:** {passer}',
+            ],
+            seperator='\n',
+        ),
+        colour=message.colour,
+        ctx=ctx,
+    )
+    # Edits only have the message to go by for who asked for it.
+    if previous and previous.embeds and (footer := previous.embeds[0].footer).text:
+        embed.set_footer(text=footer.text, icon_url=footer.icon_url)
 
-class SmashOrPass(BaseView):
-    message: discord.Message | None
-    ctx: DeContext
-    current: WaifuResult
-    token: str
+    embed.set_image(url=message.url)
 
-    def __init__(self, session: ClientSession, *, for_user: int, nsfw: bool, source: str, query: None | str = None) -> None:
-        super().__init__(timeout=500.0)
-        self.session = session
-        self.for_user = for_user
-        self.nsfw = nsfw
-        self.source = source
-        self.query = query
+    return embed
 
-        self.smashers: set[discord.User | discord.Member] = set()
-        self.passers: set[discord.User | discord.Member] = set()
 
-    @classmethod
-    async def start(cls, ctx: DeContext, source: str, *, query: None | str = None) -> Self | None:
-        inst = cls(
-            ctx.bot.session,
-            for_user=ctx.author.id,
-            nsfw=ctx.channel.is_nsfw()
-            if not isinstance(ctx.channel, discord.DMChannel | discord.GroupChannel | discord.PartialMessageable)
-            else False,
-            source=source,
-            query=query,
-        )
-        inst.token = ctx.bot.config.get('bot', 'waifu')
-        inst.ctx = ctx
-        data = await inst.request()
+def smash_or_pass_controls(message: SmashOrPassMessage) -> discord.ui.View:
+    # Only dynamic items, so the view store keeps nothing for the message.
+    view = discord.ui.View(timeout=None)
+    for action in BUTTONS:
+        view.add_item(SmashOrPassButton(action, message.source, nsfw=message.nsfw, image_id=message.image_id))
+    return view
 
-        embed = inst.embed(data)
-        inst.message = await ctx.reply(embed=embed, view=inst)
 
-        return inst
+def schedule_render(interaction: discord.Interaction[DeBot], message: SmashOrPassMessage) -> None:
+    # The interaction must already be acknowledged, its token is what the coalesced edit goes through.
+    message.pending = interaction
+    if message.renderer is None or message.renderer.done():
+        message.renderer = asyncio.create_task(_render(message))
 
-    async def request(self) -> WaifuResult:
-        raise NotImplementedError
 
-    def embed(self, data: WaifuResult) -> discord.Embed:
-        smasher = better_string([user.mention for user in self.smashers], seperator=', ') or discord.utils.MISSING
-        passer = better_string([user.mention for user in self.passers], seperator=', ') or discord.utils.MISSING
+async def _render(message: SmashOrPassMessage) -> None:
+    # Votes only mark the message as stale, this applies the latest state at most once per interval.
+    while True:
+        interval = message.pending.client.config.votes.edit_interval if message.pending else 0
+        await asyncio.sleep(max(message.last_render + interval - time.monotonic(), 0))
+        async with message.editing:
+            # None once nothing changed since the last edit, which may have been a direct one.
+            interaction, message.pending = message.pending, None
+            if interaction is None:
+                return
 
-        embed = Embed(
-            title='Smash or Pass',
-            description=better_string(
-                [
-                    (f'> [#{data.image_id}]({data.source})' if data.image_id and data.source else None),
-                    f'- <:MafuyuBlush:1314149745794617365> **Smashers:** {smasher}',
-                    f'- <:MafuyuUnamused:1314149535043293215> **Passers:** {passer}',
-                ],
-                seperator='\n',
-            ),
-            colour=(discord.Colour.from_str(data.dominant_color) if data.dominant_color else None),
-            ctx=self.ctx,
-        )
+            message.last_render = time.monotonic()
+            try:
+                await interaction.edit_original_response(
+                    embed=smash_or_pass_embed(interaction.client, message, previous=interaction.message)
+                )
+            except discord.HTTPException:
+                log.debug('Could not edit smash or pass message %s', message.message_id, exc_info=True)
 
-        embed.set_image(url=data.url)
 
-        return embed
+def rendered(message: SmashOrPassMessage) -> None:
+    # The message was just edited directly, so a pending coalesced edit has nothing new to show.
+    message.pending = None
+    message.last_render = time.monotonic()
 
-    @discord.ui.button(
-        emoji='<:MafuyuBlush:1314149745794617365>',
-        style=discord.ButtonStyle.green,
-    )
-    async def smash(self, interaction: discord.Interaction[DeBot], _: discord.ui.Button[Self]) -> None:
-        if interaction.user in self.smashers:
+
+class SmashOrPassButton(
+    discord.ui.DynamicItem[discord.ui.Button[discord.ui.View]],
+    template=r'sop:(?P<action>smash|pass|next):(?P<source>[a-z]+):(?P<nsfw>[01]):(?P<image_id>\d+)',
+):
+    """
+    A smash or pass button that works on any message, even ones sent before a restart.
+
+    The custom ID says which image the button was for, everything else is in the message's stored state.
+    """
+
+    # Set while the cog is loaded. Its name depends on the class it's mixed into, so get_cog can't find it.
+    cog: ClassVar[Waifu | None] = None
+
+    def __init__(self, action: str, source: str, *, nsfw: bool, image_id: int) -> None:
+        emoji, style = BUTTONS[action]
+        super().__init__(
+            discord.ui.Button(emoji=emoji, style=style, custom_id=f'sop:{action}:{source}:{int(nsfw)}:{image_id}'),
+        )
+        self.action = action
+        self.source = source
+        self.nsfw = nsfw
+        self.image_id = image_id
+
+    @classmethod
+    async def from_custom_id(
+        cls,
+        _: discord.Interaction[DeBot],
+        __: discord.ui.Item[Any],
+        match: re.Match[str],
+    ) -> Self:
+        return cls(match['action'], match['source'], nsfw=match['nsfw'] == '1', image_id=int(match['image_id']))
+
+    async def callback(self, interaction: discord.Interaction[DeBot]) -> None:
+        # Dynamic items run outside of any view's error handling, discord.py would only log this.
+        try:
+            await self.handle(interaction)
+        except Exception as error:  # noqa: BLE001
+            await report_interaction_error(interaction, error, origin=f'Button {self.__class__.__name__}')
+
+    async def handle(self, interaction: discord.Interaction[DeBot]) -> None:
+        bind_requester(interaction.guild_id, interaction.user.id)
+        cog = SmashOrPassButton.cog
+        if cog is None or interaction.message is None:
+            await interaction.response.defer()
+            return
+
+        message = await cog.messages.get(interaction.message.id)
+        if message is None:
+            await interaction.response.send_message('This message has expired, start a new one!', ephemeral=True)
+            return
+        if message.image_id != self.image_id:
+            # Clicked just as the owner cycled past this image.
+            await interaction.response.defer()
+            return
+
+        if self.action == 'next':
+            await self.next(interaction, cog, message)
+        else:
+            await self.vote(interaction, cog, message, smash=self.action == 'smash')
+
+    async def vote(
+        self,
+        interaction: discord.Interaction[DeBot],
+        cog: Waifu,
+        message: SmashOrPassMessage,
+        *,
+        smash: bool,
+    ) -> None:
+        user_id = interaction.user.id
+        voted, other = (message.smashers, message.passers) if smash else (message.passers, message.smashers)
+        if user_id in voted:
+            if not smash:
+                await interaction.response.defer()
+                return
             try:
-                await interaction.client.pool.execute(
-                    """INSERT INTO WaifuFavourites VALUES ($1, $2, $3)""",
-                    self.current.url,
-                    interaction.user.id,
-                    self.nsfw,
-                )
+                await interaction.client.db.execute(Queries.ADD_FAVOURITE, message.url, user_id, message.nsfw)
             except UniqueViolationError:
-                return await interaction.response.send_message(
+                await interaction.response.send_message(
                     'You have already added this waifu in your favourites list',
                     ephemeral=True,
                 )
-            return await interaction.response.send_message(
-                f'Successfully added [#{self.current.image_id}](<{self.current.url}>) to your favourites!',
+                return
+            await interaction.response.send_message(
+                f'Successfully added [#{message.image_id}](<{message.url}>) to your favourites!',
                 ephemeral=True,
             )
-
-        if interaction.user in self.passers:
-            self.passers.remove(interaction.user)
-
-        self.smashers.add(interaction.user)
-        await interaction.client.pool.execute(
-            """
-                INSERT INTO
-                    Waifus (id, smashes, nsfw, type)
-                VALUES
-                    ($1, 1, $2, $3)
-                ON CONFLICT (id, type) DO
-                UPDATE
-                SET
-                    smashes = Waifus.smashes + 1
-            """,
-            self.current.image_id,
-            self.nsfw,
-            self.source,
+            return
+
+        if user_id in other:
+            other.remove(user_id)
+        voted.append(user_id)
+        cog.messages.changed(message)
+        interaction.client.votes.add(
+            message.image_id,
+            source=message.source,
+            nsfw=message.nsfw,
+            smashes=int(smash),
+            passes=int(not smash),
         )
-        await interaction.response.edit_message(embed=self.embed(self.current))
-        return None
+        await interaction.response.defer()
+        schedule_render(interaction, message)
 
-    @discord.ui.button(
-        emoji='<:MafuyuUnamused:1314149535043293215>',
-        style=discord.ButtonStyle.red,
-    )
-    async def passbutton(self, interaction: discord.Interaction[DeBot], _: discord.ui.Button[Self]) -> None:
-        if interaction.user in self.passers:
-            return await interaction.response.defer()
-
-        if interaction.user in self.smashers:
-            self.smashers.remove(interaction.user)
-
-        self.passers.add(interaction.user)
-        await interaction.client.pool.execute(
-            """
-                INSERT INTO
-                    Waifus (id, passes, nsfw, type)
-                VALUES
-                    ($1, 1, $2, $3)
-                ON CONFLICT (id, type) DO
-                UPDATE
-                SET
-                    passes = Waifus.passes + 1
-                """,
-            self.current.image_id,
-            self.nsfw,
-            self.source,
-        )
-        await interaction.response.edit_message(embed=self.embed(self.current))
-        return None
-
-    @discord.ui.button(emoji='🔁', style=discord.ButtonStyle.grey)
-    async def _next(self, interaction: discord.Interaction[DeBot], _: discord.ui.Button[Self]) -> None:
-        self.smashers.clear()
-        self.passers.clear()
-        try:
-            data = await self.request()
-        except KeyError:
-            await interaction.response.send_message('Hey! Slow down.', ephemeral=True)
-        else:
-            await interaction.response.edit_message(embed=self.embed(data))
-
-    async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        if not self.for_user:
-            return True
-
-        if (
-            interaction.user.id != self.for_user
-            and interaction.data
-            and interaction.data.get('custom_id') == self._next.custom_id
-        ):
+    async def next(self, interaction: discord.Interaction[DeBot], cog: Waifu, message: SmashOrPassMessage) -> None:
+        if message.owner_id and interaction.user.id != message.owner_id:
             await interaction.response.send_message(
                 'Only the command initiator can cycle through waifus in this message.',
                 ephemeral=True,
             )
+            return
 
-            return False
+        try:
+            data = await cog.reservoir(message.source, nsfw=message.nsfw, query=message.query).get()
+        except KeyError:
+            await interaction.response.send_message('Hey! Slow down.', ephemeral=True)
+            return
+        except UpstreamBusyError as error:
+            await interaction.response.send_message(str(error), ephemeral=True)
+            return
+
+        # Waits for a coalesced edit in flight, it was built for the image being replaced.
+        async with message.editing:
+            message.show(data)
+            interaction.client.colours.extract(message.source, data)
+            cog.messages.changed(message)
+            await interaction.response.edit_message(
+                embed=smash_or_pass_embed(interaction.client, message, previous=interaction.message),
+                view=smash_or_pass_controls(message),
+            )
+            rendered(message)
 
-        return True
 
+DANBOORU_RATINGS = 'rating:' + better_string(['explicit', 'questionable', 'sensitive'], seperator=',')
 
-class WaifuView(SmashOrPass):
-    async def request(self) -> WaifuResult:
-        waifu = await self.session.get(
-            'https://api.waifu.im/search',
-            params={
-                'is_nsfw': 'false' if self.nsfw is False else 'null',
-                'token': self.token,
-            },
-        )
 
+async def danbooru_batch(bot: DeBot, tag: str, *, nsfw: bool, query: str | None) -> list[WaifuResult]:
+    # Safebooru is danbooru with only general and sensitive posts, so SFW searches can be hedged across both.
+    async with bot.web.hedged_get(
+        ('danbooru',) if nsfw else ('danbooru', 'safebooru'),
+        '/posts.json',
+        params={
+            'tags': better_string(['solo', tag, DANBOORU_RATINGS if nsfw else 'rating:general'], seperator=' '),
+            'random': 'true',
+            'limit': BATCH_SIZE,
+        },
+    ) as waifu:
         data = await waifu.json()
-        data = data['images'][0]
-        current = WaifuResult(
-            name=self.query,
-            image_id=data['image_id'],
-            source=data['source'],
-            dominant_color=data['dominant_color'],
-            url=data['url'],
-        )
-        self.current = current
-
-        return self.current
-
-
-class WaifuSearchView(SmashOrPass):
-    async def request(self) -> WaifuResult:
-        waifu = await self.session.get(
-            'https://danbooru.donmai.us/posts/random.json',
-            params={
-                'tags': better_string(
-                    [
-                        'solo',
-                        self.query,
-                        'rating:'
-                        + (
-                            better_string(['explicit', 'questionable', 'sensitive'], seperator=',')
-                            if self.nsfw is True
-                            else 'general'
-                        ),
-                    ],
-                    seperator=' ',
-                ),
-            },
-        )
-        data = await waifu.json()
-        success = 200
-        if waifu.status != success or not data:
-            raise WaifuNotFoundError(self.query)
-        current = WaifuResult(
-            name=self.query,
-            image_id=data['id'],
+    success = 200
+    if waifu.status != success or not data:
+        raise WaifuNotFoundError(query)
+    # Posts restricted to paying members come back without a file_url.
+    return [
+        WaifuResult(
+            name=query,
+            image_id=post['id'],
             dominant_color=None,
-            source=data['source'],
-            url=data['file_url'],
-        )
-        self.current = current
-
-        return self.current
-
-
-class SafebooruPokemonView(SmashOrPass):
-    async def request(self) -> WaifuResult:
-        waifu = await self.session.get(
-            'https://danbooru.donmai.us/posts/random.json',
-            params={
-                'tags': better_string(
-                    [
-                        'solo',
-                        'pokemon_(creature)',
-                        'rating:'
-                        + (
-                            better_string(['explicit', 'questionable', 'sensitive'], seperator=',')
-                            if self.nsfw is True
-                            else 'general'
-                        ),
-                    ],
-                    seperator=' ',
-                ),
-            },
+            source=post['source'],
+            url=post['file_url'],
+            preview=post.get('preview_file_url'),
         )
+        for post in data
+        if post.get('file_url')
+    ]
+
+
+async def waifu_batch(bot: DeBot, *, nsfw: bool, query: str | None) -> list[WaifuResult]:
+    async with bot.web.get(
+        'waifu.im',
+        '/search',
+        params={
+            'is_nsfw': 'false' if nsfw is False else 'null',
+            'many': 'true',
+            'token': bot.config.bot.waifu,
+        },
+    ) as waifu:
         data = await waifu.json()
-        current = WaifuResult(
-            name=self.query,
-            image_id=data['id'],
-            dominant_color=None,
-            source=data['source'],
-            url=data['file_url'],
+    return [
+        WaifuResult(
+            name=query,
+            image_id=image['image_id'],
+            source=image['source'],
+            dominant_color=image['dominant_color'],
+            url=image['url'],
         )
-        self.current = current
+        for image in data['images']
+    ]
+
+
+async def waifu_search_batch(bot: DeBot, *, nsfw: bool, query: str | None) -> list[WaifuResult]:
+    return await danbooru_batch(bot, query or '', nsfw=nsfw, query=query)
 
-        return self.current
+
+async def pokemon_batch(bot: DeBot, *, nsfw: bool, query: str | None) -> list[WaifuResult]:
+    return await danbooru_batch(bot, 'pokemon_(creature)', nsfw=nsfw, query=query)
+
+
+# How each waifu type refills its reservoirs.
+BATCHES: dict[str, Callable[..., Awaitable[list[WaifuResult]]]] = {
+    'waifu': waifu_batch,
+    'waifusearch': waifu_search_batch,
+    'pokemon': pokemon_batch,
+}
+
+
+class FavouritesPaginator(KeysetPaginator[asyncpg.Record, tuple[datetime.datetime, str]]):
+    def __init__(self, db: Database, user: discord.User | discord.Member, *, nsfw: bool) -> None:
+        super().__init__(for_user=user.id)
+        self.db = db
+        self.user = user
+        self.nsfw = nsfw
+
+    async def fetch(self, after: tuple[datetime.datetime, str] | None, limit: int) -> list[asyncpg.Record]:
+        if after is None:
+            query = Queries.FAVOURITES if self.nsfw else Queries.SFW_FAVOURITES
+            return await self.db.fetch(query, self.user.id, limit)
+        query = Queries.FAVOURITES_AFTER if self.nsfw else Queries.SFW_FAVOURITES_AFTER
+        return await self.db.fetch(query, self.user.id, limit, *after)
+
+    def key(self, entry: asyncpg.Record) -> tuple[datetime.datetime, str]:
+        return entry['tm'], entry['waifu_url']
+
+    def format_page(self, entries: list[asyncpg.Record]) -> discord.Embed:
+        embed = Embed(
+            title=f"{self.user.display_name}'s favourites",
+            description=better_string(
+                (
+                    f'- [{entry["waifu_url"].rsplit("/", 1)[-1]}]({entry["waifu_url"]}) '
+                    f'{discord.utils.format_dt(entry["tm"].replace(tzinfo=datetime.UTC), "R")}'
+                    for entry in entries
+                ),
+                seperator='\n',
+            ),
+            ctx=self.ctx,
+        )
+        embed.set_image(url=entries[0]['waifu_url'])
+        return embed
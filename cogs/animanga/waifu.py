@@ -1,109 +1,160 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, cast
+import functools
+from typing import TYPE_CHECKING, Literal
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from utils import BaseCog
+from utils import BaseCog, Embed, better_string, bind_requester
 from utils.errors import WaifuNotFoundError
 
-from .views import SafebooruPokemonView, WaifuSearchView, WaifuView
+from .characters import CharacterIndex
+from .messages import SmashOrPassMessage, SmashOrPassMessages
+from .reservoir import Reservoirs
+from .tags import TagCache
+from .views import BATCHES, FavouritesPaginator, SmashOrPassButton, smash_or_pass_controls, smash_or_pass_embed
 
 if TYPE_CHECKING:
     from bot import DeBot
     from utils import DeContext
 
+    from .reservoir import Reservoir
+    from .tags import Tag
+
 __all__ = ('Waifu',)
 
-CHARACTER_ID = 4
 
+class Waifu(BaseCog):
+    def __init__(self, bot: DeBot) -> None:
+        super().__init__(bot)
+        self.reservoirs = Reservoirs()
+        self.tags = TagCache(bot.web)
+        self.characters = CharacterIndex(bot.db, bot.web)
+        self.messages = SmashOrPassMessages(bot.db, interval=bot.config.votes.flush_interval)
 
-async def waifu_autocomplete(
-    interaction: discord.Interaction[DeBot],
-    current: str,
-) -> list[app_commands.Choice[str]]:
-    req = await interaction.client.session.get(
-        'https://safebooru.donmai.us/autocomplete.json',
-        params={
-            'search[query]': current,
-            'search[type]': 'tag_query',
-        },
-    )
-    data = await req.json()
-    characters = [(str(obj['label']), str(obj['value'])) for obj in data if obj['category'] == CHARACTER_ID]
-    return [app_commands.Choice(name=char[0].title(), value=char[1]) for char in characters]
+    async def cog_load(self) -> None:
+        self.characters.start()
+        self.messages.start()
+        SmashOrPassButton.cog = self
+        self.bot.add_dynamic_items(SmashOrPassButton)
 
+    async def cog_before_invoke(self, ctx: DeContext) -> None:
+        bind_requester(ctx.guild.id if ctx.guild else None, ctx.author.id)
+
+    async def cog_unload(self) -> None:
+        self.bot.remove_dynamic_items(SmashOrPassButton)
+        SmashOrPassButton.cog = None
+        self.characters.close()
+        self.reservoirs.close()
+        await self.messages.close()
+
+    async def find_characters(self, query: str) -> list[Tag]:
+        # Danbooru is only asked when the local index has nothing, e.g. before its first refresh finished.
+        return self.characters.search(self.tags.normalise(query)) or await self.tags.characters(query)
+
+    @staticmethod
+    def is_nsfw(ctx: DeContext) -> bool:
+        return (
+            ctx.channel.is_nsfw()
+            if not isinstance(ctx.channel, discord.DMChannel | discord.GroupChannel | discord.PartialMessageable)
+            else False
+        )
+
+    def reservoir(self, source: str, *, nsfw: bool, query: str | None) -> Reservoir:
+        return self.reservoirs.get(
+            (source, nsfw, query),
+            functools.partial(BATCHES[source], self.bot, nsfw=nsfw, query=query),
+        )
+
+    async def smash_or_pass(self, ctx: DeContext, source: str, *, query: str | None = None) -> None:
+        nsfw = self.is_nsfw(ctx)
+        data = await self.reservoir(source, nsfw=nsfw, query=query).get()
+        self.bot.colours.extract(source, data)
+
+        state = SmashOrPassMessage(0, ctx.author.id, source, nsfw, query)
+        state.show(data)
+        message = await ctx.reply(embed=smash_or_pass_embed(self.bot, state, ctx=ctx), view=smash_or_pass_controls(state))
+        state.message_id = message.id
+        self.messages.add(state)
 
-class Waifu(BaseCog):
     @commands.hybrid_group(name='waifu', help='Get waifu images with an option to smash or pass')
     @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
     @app_commands.allowed_installs(guilds=True, users=True)
     async def waifu(self, ctx: DeContext, waifu: str | None) -> None:
         if waifu:
-            req = await ctx.bot.session.get(
-                'https://safebooru.donmai.us/autocomplete.json',
-                params={
-                    'search[query]': waifu,
-                    'search[type]': 'tag_query',
-                },
-            )
-            data = await req.json()
-            success = 200
-            if req.status != success or not data:
+            characters = await self.find_characters(waifu)
+            if not characters:
                 raise WaifuNotFoundError(waifu)
-            characters = [(str(obj['label']), str(obj['value'])) for obj in data if obj['category'] == CHARACTER_ID]
-            waifu = characters[0][1]  # Points to the value of the first result
+            waifu = characters[0].value
 
         await ctx.invoke(self.waifu_show, waifu)
 
-    @waifu.command(name='favourites', with_app_command=False)
-    @commands.is_owner()
+    @waifu.command(name='favourites', help='Browse the waifus you have added to your favourites')
     async def waifu_favourites(self, ctx: DeContext) -> None:
-        await ctx.reply('test')
+        view = FavouritesPaginator(self.bot.db, ctx.author, nsfw=self.is_nsfw(ctx))
+        if not await view.start(ctx):
+            await ctx.reply('You have not added any waifus to your favourites yet. Smash one twice to add it!')
 
     @waifu.command(
         name='show',
         hidden=True,
         help='Get waifu images with an option to smash or pass',
     )
-    @app_commands.autocomplete(waifu=waifu_autocomplete)
     async def waifu_show(self, ctx: DeContext, waifu: str | None) -> None:
-        ctx.channel = cast(discord.TextChannel, ctx.channel)
         if waifu:
-            view = WaifuSearchView(
-                self.bot.session,
-                for_user=ctx.author.id,
-                nsfw=ctx.channel.is_nsfw()
-                if not isinstance(ctx.channel, discord.DMChannel | discord.GroupChannel | discord.PartialMessageable)
-                else False,
-                source='waifusearch',
-                query=waifu,
-            )
-            await view.start(ctx, 'waifusearch', query=waifu)
+            await self.smash_or_pass(ctx, 'waifusearch', query=waifu)
             return
-        view = WaifuView(
-            self.bot.session,
-            for_user=ctx.author.id,
-            nsfw=ctx.channel.is_nsfw()
-            if not isinstance(ctx.channel, discord.DMChannel | discord.GroupChannel | discord.PartialMessageable)
-            else False,
-            source='waifu',
+        await self.smash_or_pass(ctx, 'waifu')
+
+    @waifu_show.autocomplete('waifu')
+    async def waifu_autocomplete(
+        self,
+        interaction: discord.Interaction[DeBot],
+        current: str,
+    ) -> list[app_commands.Choice[str]]:
+        bind_requester(interaction.guild_id, interaction.user.id)
+        characters = self.characters.search(self.tags.normalise(current)) or await self.tags.autocomplete(
+            interaction.user.id,
+            interaction.id,
+            current,
         )
-        await view.start(ctx, 'waifu', query=waifu)
+        return [app_commands.Choice(name=char.label.title(), value=char.value) for char in characters]
 
     @commands.hybrid_command(name='pokemon', help='Get pokemon images with an option to smash or pass')
     @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
     @app_commands.allowed_installs(guilds=True, users=True)
     async def pokemon(self, ctx: DeContext) -> None:
-        ctx.channel = cast(discord.TextChannel, ctx.channel)
-        view = SafebooruPokemonView(
-            self.bot.session,
-            for_user=ctx.author.id,
-            nsfw=ctx.channel.is_nsfw()
-            if not isinstance(ctx.channel, discord.DMChannel | discord.GroupChannel | discord.PartialMessageable)
-            else False,
-            source='pokemon',
+        await self.smash_or_pass(ctx, 'pokemon')
+
+    @commands.hybrid_command(name='leaderboard', aliases=['lb'], help='See the most smashed waifus and pokemon')
+    @app_commands.allowed_contexts(guilds=True, dms=True, private_channels=True)
+    @app_commands.allowed_installs(guilds=True, users=True)
+    async def leaderboard(self, ctx: DeContext, source: Literal['waifu', 'waifusearch', 'pokemon'] = 'waifu') -> None:
+        entries = self.bot.leaderboard.top(source, nsfw=self.is_nsfw(ctx))
+        if not entries:
+            await ctx.reply('Nobody has smashed anything here yet.')
+            return
+
+        embed = Embed(
+            title=f'Most smashed ({source})',
+            description=better_string(
+                (
+                    f'{rank}. {self.image_link(source, entry.image_id)} '
+                    f'<:MafuyuBlush:1314149745794617365> **{entry.smashes}** '
+                    f'<:MafuyuUnamused:1314149535043293215> **{entry.passes}**'
+                    for rank, entry in enumerate(entries, start=1)
+                ),
+                seperator='\n',
+            ),
+            ctx=ctx,
         )
-        await view.start(ctx, 'pokemon')
+        await ctx.reply(embed=embed)
+
+    @staticmethod
+    def image_link(source: str, image_id: int) -> str:
+        # waifu.im has no page per image, danbooru posts can be linked to.
+        if source == 'waifu':
+            return f'#{image_id}'
+        return f'[#{image_id}](<https://danbooru.donmai.us/posts/{image_id}>)'
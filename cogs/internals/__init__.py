@@ -13,9 +13,10 @@ from discord.ext import commands
 
 from .dev import Developer
 from .error_handler import ErrorHandler
+from .metrics import CommandMetrics
 
 
-class Internals(ErrorHandler, Developer, name='Internals'):
+class Internals(ErrorHandler, Developer, CommandMetrics, name='Internals'):
     def cog_load(self) -> None:
         self.bot.help_command = starlight.MenuHelpCommand(
             per_page=10, accent_color=self.bot.colour, error_color=discord.Color.red()
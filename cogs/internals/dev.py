@@ -20,3 +20,38 @@ class Developer(BaseCog):
             else:
                 messages.append(f'Reloaded {cog}')
         await ctx.send(content=better_string(messages, seperator='\n'))
+
+    @commands.command(name='reloadconfig', aliases=['rc'], hidden=True)
+    async def reload_config(self, ctx: DeContext) -> None:
+        await self.bot.reload_config(force=True)
+        await ctx.send(content=f'Reloaded {self.bot.config.path}')
+
+    @commands.command(name='poolstats', hidden=True)
+    async def pool_stats(self, ctx: DeContext) -> None:
+        stats = self.bot.db.stats()
+        await ctx.send(
+            content=better_string(
+                [
+                    f'- **Connections :** `{stats.size - stats.idle}` in use, `{stats.idle}` idle',
+                    f'  - **Bounds :** `{stats.min_size}` to `{stats.max_size}`',
+                    f'- **Acquisitions :** `{stats.acquisitions}`',
+                    f'  - **Wait :** `{stats.average_wait * 1000:.2f}ms` average, `{stats.max_wait * 1000:.2f}ms` max',
+                ],
+                seperator='\n',
+            )
+        )
+
+    @commands.command(name='httpstats', hidden=True)
+    async def http_stats(self, ctx: DeContext) -> None:
+        await ctx.send(
+            content=better_string(
+                [
+                    f'- **{name} ({self.bot.web.breakers[name].state}) :** '
+                    f'`{stats.requests}` requests, `{stats.errors}` errors, `{stats.retries}` retries\n'
+                    f'  - **Rate limit :** `{stats.throttled}` throttled, `{stats.rejected}` rejected\n'
+                    f'  - **Latency :** `{stats.average * 1000:.0f}ms` average, `{stats.percentile(0.95) * 1000:.0f}ms` p95'
+                    for name, stats in self.bot.web.stats.items()
+                ],
+                seperator='\n',
+            )
+        )
@@ -4,15 +4,14 @@ import contextlib
 from typing import TYPE_CHECKING, Self
 
 import discord
+from discord import app_commands
 from discord.ext import commands
 
-from utils import BaseCog, BaseView, DeContext, better_string
+from utils import BaseCog, BaseView, BlacklistedGuildError, BlacklistedUserError, DeBotError, DeContext, better_string
 
 if TYPE_CHECKING:
     from bot import DeBot
 
-CHAR_LIMIT = 2000
-
 HANDLER_EMOJIS = {'redTick': '<a:redtick:1315758805585498203>', 'greyTick': '<:grey_tick:1278414780427796631>'}
 
 
@@ -89,3 +88,32 @@ class ErrorHandler(BaseCog):
             view = MissingArgumentHandler(error, ctx)
             view.prev_message = await ctx.reply(content=str(error), view=view)
             return
+
+        original: BaseException = error
+        while isinstance(
+            original, commands.CommandInvokeError | commands.HybridCommandError | app_commands.CommandInvokeError
+        ):
+            original = original.original
+        if isinstance(original, BlacklistedUserError | BlacklistedGuildError):
+            return
+        if isinstance(original, DeBotError | commands.UserInputError):
+            with contextlib.suppress(discord.HTTPException):
+                await ctx.reply(str(original))
+            return
+        # Check failures stay silent, answering them would reveal owner-only commands to anyone.
+        if isinstance(original, commands.CommandError | app_commands.AppCommandError):
+            return
+
+        self.bot.errors.report(
+            original,
+            origin=f'Command {ctx.command.qualified_name}',
+            context=better_string(
+                [
+                    f'> - **User: **{ctx.author!s}',
+                    f"> - **Server: **{ctx.guild.name if ctx.guild else 'No guild'!s}",
+                ],
+                seperator='\n',
+            ),
+        )
+        with contextlib.suppress(discord.HTTPException):
+            await ctx.reply('Something went wrong.\n-# Developers have been informed')
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+from discord.ext import commands
+
+from utils import BaseCog
+
+if TYPE_CHECKING:
+    from utils import DeContext
+
+
+class CommandMetrics(BaseCog):
+    # on_command fires before checks run, so failed checks are timed too.
+    @commands.Cog.listener('on_command')
+    async def start_command_timer(self, ctx: DeContext) -> None:
+        ctx.started_at = time.perf_counter()
+
+    @commands.Cog.listener('on_command_completion')
+    async def record_command(self, ctx: DeContext) -> None:
+        self.observe(ctx, 'completed')
+
+    @commands.Cog.listener('on_command_error')
+    async def record_command_error(self, ctx: DeContext, _: commands.CommandError) -> None:
+        if ctx.command:
+            self.observe(ctx, 'failed')
+
+    def observe(self, ctx: DeContext, outcome: str) -> None:
+        name = ctx.command.qualified_name if ctx.command else 'unknown'
+        self.bot.metrics.commands.inc(name, outcome)
+        if ctx.started_at is not None:
+            self.bot.metrics.command_duration.observe(time.perf_counter() - ctx.started_at, name)
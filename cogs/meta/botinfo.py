@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import datetime
 import importlib.metadata
 import platform
+from typing import TYPE_CHECKING, NamedTuple
 
 import discord
 import humanize
@@ -12,15 +15,49 @@ from discord.ext import commands
 
 from utils import BaseCog, DeContext, Embed, better_string
 
-try:
-    from importlib.metadata import distribution, packages_distributions
-except ImportError:
-    from importlib_metadata import distribution, packages_distributions
+if TYPE_CHECKING:
+    from bot import DeBot
 
-import importlib
+
+class BotMetadata(NamedTuple):
+    library: str
+    python: str
+    total_memory: int
+
+
+def library_version() -> str:
+    # Reads the metadata of every installed package, so it runs once in a thread.
+    distributions = [
+        dist
+        for dist in importlib.metadata.packages_distributions().get('discord', [])
+        if any(file.parts == ('discord', '__init__.py') for file in importlib.metadata.distribution(dist).files or [])
+    ]
+    if distributions:
+        return f'{distributions[0]} {importlib.metadata.version(distributions[0])}'
+    return f'unknown {discord.__version__}'
 
 
 class BotInformation(BaseCog):
+    metadata: BotMetadata
+
+    def __init__(self, bot: DeBot) -> None:
+        super().__init__(bot)
+        self.process = psutil.Process()
+        # The gateway keeps bot.user up to date but may leave its banner out, the API is only asked once for it.
+        self.fetched_banner: discord.Asset | None = None
+
+    async def cog_load(self) -> None:
+        # Nothing in here changes while the process runs.
+        library = await asyncio.to_thread(library_version)
+        self.metadata = BotMetadata(library, platform.python_version(), psutil.virtual_memory().total)
+        if not self.bot.user.banner:
+            with contextlib.suppress(discord.HTTPException):
+                self.fetched_banner = (await self.bot.fetch_user(self.bot.user.id)).banner
+
+    @property
+    def banner(self) -> discord.Asset | None:
+        return self.bot.user.banner or self.fetched_banner
+
     @commands.hybrid_command(
         name='about',
         aliases=['info'],
@@ -51,35 +88,23 @@ class BotInformation(BaseCog):
             ),
         )
 
-        distributions: list[str] = [
-            dist
-            for dist in packages_distributions()['discord']
-            if any(file.parts == ('discord', '__init__.py') for file in distribution(dist).files)  # pyright: ignore[reportOptionalIterable]
-        ]
-
-        if distributions:
-            dist_version = f'{distributions[0]} {importlib.metadata.version(distributions[0])}'
-        else:
-            dist_version = f'unknown {discord.__version__}'
-        proc = psutil.Process()
+        metadata = self.metadata
+        proc = self.process
         with proc.oneshot():
             memory = proc.memory_info().rss
             uptime = humanize.naturaldelta(
                 datetime.timedelta(seconds=datetime.datetime.now(datetime.UTC).timestamp() - bot.load_time.timestamp())
             )
             memory_usage = (
-                str(round((memory / 1024) / 1024))
-                + '/'
-                + str(round(((psutil.virtual_memory().total) / 1024) / 1024))
-                + ' MB'
+                str(round((memory / 1024) / 1024)) + '/' + str(round((metadata.total_memory / 1024) / 1024)) + ' MB'
             )
             embed.add_field(
                 name='System Statistics',
                 value=better_string(
                     [
-                        f'> Made in `Python {platform.python_version()}` using `{dist_version}`',
+                        f'> Made in `Python {metadata.python}` using `{metadata.library}`',
                         f'- **Uptime :** {uptime}',
-                        f'- **Memory :** `{memory_usage}` (`{round(proc.memory_percent(), 2)}%`)',
+                        f'- **Memory :** `{memory_usage}` (`{round(memory / metadata.total_memory * 100, 2)}%`)',
                     ],
                     seperator='\n',
                 ),
@@ -105,6 +130,6 @@ class BotInformation(BaseCog):
         )
 
         embed.set_thumbnail(url=bot.user.avatar.url if bot.user.avatar else None)
-        embed.set_image(url=(bot.user.banner or (await bot.fetch_user(bot.user.id)).banner))
+        embed.set_image(url=self.banner)
 
         await ctx.send(embed=embed)
@@ -1,5 +1,3 @@
-BEGIN;
-
 DO $$ BEGIN
         CREATE TYPE WaifuType AS ENUM('pokemon', 'waifu', 'waifusearch');
         CREATE TYPE BlacklistTypes AS ENUM('guild', 'user');
@@ -36,6 +34,3 @@ CREATE TABLE IF NOT EXISTS Waifus (
     type WaifuType NOT NULL,
     PRIMARY KEY (id, type)
 );
-
-COMMIT;
-
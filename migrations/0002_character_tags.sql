@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS CharacterTags (
+    name TEXT NOT NULL PRIMARY KEY,
+    post_count INTEGER NOT NULL,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc')
+);
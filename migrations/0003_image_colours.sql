@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS ImageColours (
+    id INTEGER NOT NULL,
+    type WaifuType NOT NULL,
+    colour INTEGER NOT NULL,
+    PRIMARY KEY (id, type)
+);
@@ -0,0 +1,4 @@
+-- migrate: no-transaction
+-- A failed concurrent build leaves an invalid index behind that IF NOT EXISTS would skip over on the next attempt.
+DROP INDEX CONCURRENTLY IF EXISTS waifu_favourites_user_tm_idx;
+CREATE INDEX CONCURRENTLY waifu_favourites_user_tm_idx ON WaifuFavourites (user_id, tm DESC, waifu_url DESC);
@@ -0,0 +1,4 @@
+-- migrate: no-transaction
+-- A failed concurrent build leaves an invalid index behind that IF NOT EXISTS would skip over on the next attempt.
+DROP INDEX CONCURRENTLY IF EXISTS waifus_type_nsfw_smashes_idx;
+CREATE INDEX CONCURRENTLY waifus_type_nsfw_smashes_idx ON Waifus (type, nsfw, smashes DESC, id);
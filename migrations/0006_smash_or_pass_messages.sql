@@ -0,0 +1,16 @@
+CREATE TABLE IF NOT EXISTS SmashOrPassMessages (
+    message_id BIGINT NOT NULL PRIMARY KEY,
+    owner_id BIGINT NOT NULL,
+    type WaifuType NOT NULL,
+    nsfw BOOLEAN NOT NULL,
+    query TEXT,
+    image_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    page TEXT,
+    colour INTEGER,
+    smashers BIGINT[] NOT NULL DEFAULT '{}',
+    passers BIGINT[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc')
+);
+
+CREATE INDEX IF NOT EXISTS smash_or_pass_messages_updated_at_idx ON SmashOrPassMessages (updated_at);
@@ -1,7 +1,9 @@
 from .basecog import BaseCog
 from .blacklist import Blacklist
-from .config import BASE_PREFIX, DESCRIPTION, OWNERS_ID, THEME_COLOUR
+from .colour import ColourExtractor, dominant_colour
+from .config import BASE_PREFIX, CONFIG_PATH, DESCRIPTION, OWNERS_ID, THEME_COLOUR, Config
 from .context import DeContext
+from .database import Database, PoolStats, Queries, Query
 from .embed import Embed
 from .errors import (
     AlreadyBlacklistedError,
@@ -9,22 +11,41 @@ from .errors import (
     BlacklistedUserError,
     DeBotError,
     FeatureDisabledError,
+    MigrationError,
     NotBlacklistedError,
     PrefixAlreadyPresentError,
     PrefixNotInitialisedError,
     PrefixNotPresentError,
     UnderMaintenanceError,
+    UpstreamBusyError,
+    UpstreamUnavailableError,
     WaifuNotFoundError,
 )
 from .helper_functions import ActivityHandler, better_string
+from .http import UPSTREAM_ERRORS, UPSTREAMS, CircuitBreaker, HTTPClient, Upstream, UpstreamStats
+from .leaderboard import WAIFU_TYPES, Leaderboard, LeaderboardEntry
+from .logshipper import LogShipper
+from .metrics import BotMetrics, Counter, Gauge, Histogram, MetricsServer, Registry, Summary
+from .migrations import MIGRATIONS_PATH, Migration, apply_migrations, load_migrations
+from .pagination import KeysetPaginator
+from .prefix import PrefixMatcher
+from .ratelimit import FairScheduler, TokenBucket, bind_requester
+from .reporting import ErrorGroup, ErrorReporter, fingerprint
 from .types import BlacklistBase, WaifuResult
-from .view import BaseView
+from .view import BaseView, report_interaction_error
+from .votes import VoteBuffer
+from .webhooks import WebhookQueue
 
 __all__ = (
     'BASE_PREFIX',
+    'CONFIG_PATH',
     'DESCRIPTION',
+    'MIGRATIONS_PATH',
     'OWNERS_ID',
     'THEME_COLOUR',
+    'UPSTREAMS',
+    'UPSTREAM_ERRORS',
+    'WAIFU_TYPES',
     'ActivityHandler',
     'AlreadyBlacklistedError',
     'BaseCog',
@@ -33,16 +54,54 @@ __all__ = (
     'BlacklistBase',
     'BlacklistedGuildError',
     'BlacklistedUserError',
+    'BotMetrics',
+    'CircuitBreaker',
+    'ColourExtractor',
+    'Config',
+    'Counter',
+    'Database',
     'DeBotError',
     'DeContext',
     'Embed',
+    'ErrorGroup',
+    'ErrorReporter',
+    'FairScheduler',
     'FeatureDisabledError',
+    'Gauge',
+    'HTTPClient',
+    'Histogram',
+    'KeysetPaginator',
+    'Leaderboard',
+    'LeaderboardEntry',
+    'LogShipper',
+    'MetricsServer',
+    'Migration',
+    'MigrationError',
     'NotBlacklistedError',
+    'PoolStats',
     'PrefixAlreadyPresentError',
+    'PrefixMatcher',
     'PrefixNotInitialisedError',
     'PrefixNotPresentError',
+    'Queries',
+    'Query',
+    'Registry',
+    'Summary',
+    'TokenBucket',
     'UnderMaintenanceError',
+    'Upstream',
+    'UpstreamBusyError',
+    'UpstreamStats',
+    'UpstreamUnavailableError',
+    'VoteBuffer',
     'WaifuNotFoundError',
     'WaifuResult',
+    'WebhookQueue',
+    'apply_migrations',
     'better_string',
+    'bind_requester',
+    'dominant_colour',
+    'fingerprint',
+    'load_migrations',
+    'report_interaction_error',
 )
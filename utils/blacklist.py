@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import asyncio
+import datetime
+import heapq
 from typing import TYPE_CHECKING, Literal
 
+import asyncpg
 import discord
 
+from .database import Queries
 from .errors import (
     AlreadyBlacklistedError,
     BlacklistedGuildError,
@@ -14,8 +19,6 @@ from .errors import (
 __all__ = ('Blacklist',)
 
 if TYPE_CHECKING:
-    import datetime
-
     from discord.abc import Snowflake
 
     from bot import DeBot
@@ -23,33 +26,55 @@ if TYPE_CHECKING:
     from .context import DeContext
     from .types import BlacklistBase
 
+# asyncio.sleep misbehaves with very long delays, so long expiries are waited on in chunks.
+MAX_SLEEP = datetime.timedelta(days=40)
+
 
 class Blacklist:
-    blacklists: dict[Snowflake, BlacklistBase]
+    blacklists: dict[int, BlacklistBase]
+    users: set[int]
+    guilds: set[int]
 
     def __init__(self, bot: DeBot) -> None:
         self.blacklists = {}
+        # Plain ID sets mirroring self.blacklists, for DeBot's pre-dispatch gate.
+        self.users = set()
+        self.guilds = set()
         self.bot = bot
+        # Min-heap of (lasts_until, snowflake). Entries that were removed or re-added are skipped when popped.
+        self._expiries: list[tuple[datetime.datetime, int]] = []
+        self._expiry_task: asyncio.Task[None] | None = None
         self.bot.check_once(self.check)
 
+    async def load(self) -> dict[int, BlacklistBase]:
+        records = await self.bot.db.fetch(Queries.BLACKLISTS)
+        self.blacklists = {
+            record['snowflake']: {
+                'reason': record['reason'],
+                'lasts_until': record['lasts_until'].replace(tzinfo=datetime.UTC) if record['lasts_until'] else None,
+                'blacklist_type': record['blacklist_type'],
+            }
+            for record in records
+        }
+        self.users = {snowflake for snowflake, entry in self.blacklists.items() if entry['blacklist_type'] == 'user'}
+        self.guilds = {snowflake for snowflake, entry in self.blacklists.items() if entry['blacklist_type'] == 'guild'}
+        self._expiries = [
+            (entry['lasts_until'], snowflake) for snowflake, entry in self.blacklists.items() if entry['lasts_until']
+        ]
+        heapq.heapify(self._expiries)
+        self._schedule_expiry()
+        return self.blacklists
+
     async def check(self, ctx: DeContext) -> Literal[True]:
-        if ctx.guild and self.is_blacklisted(ctx.guild):
-            raise BlacklistedGuildError(
-                ctx.guild,
-                reason=self.blacklists[ctx.guild]['reason'],
-                until=self.blacklists[ctx.guild]['lasts_until'],
-            )
-        if ctx.author and self.is_blacklisted(ctx.author):
-            raise BlacklistedUserError(
-                ctx.author,
-                reason=self.blacklists[ctx.author]['reason'],
-                until=self.blacklists[ctx.author]['lasts_until'],
-            )
+        if ctx.guild and (entry := self.blacklists.get(ctx.guild.id)):
+            raise BlacklistedGuildError(ctx.guild, reason=entry['reason'], until=entry['lasts_until'])
+        if ctx.author and (entry := self.blacklists.get(ctx.author.id)):
+            raise BlacklistedUserError(ctx.author, reason=entry['reason'], until=entry['lasts_until'])
 
         return True
 
-    def is_blacklisted(self, snowflake: discord.Member | discord.User | discord.Guild) -> bool:
-        return bool(self.blacklists.get(snowflake))
+    def is_blacklisted(self, snowflake: Snowflake | int) -> bool:
+        return (snowflake if isinstance(snowflake, int) else snowflake.id) in self.blacklists
 
     async def add(
         self,
@@ -57,46 +82,78 @@ class Blacklist:
         *,
         reason: str = 'No reason provided',
         lasts_until: datetime.datetime | None = None,
-    ) -> dict[Snowflake, BlacklistBase]:
-        if self.is_blacklisted(snowflake):
-            raise AlreadyBlacklistedError(
-                snowflake,
-                reason=self.blacklists[snowflake]['reason'],
-                until=self.blacklists[snowflake]['lasts_until'],
-            )
-
-        sql = """INSERT INTO Blacklists (snowflake, reason, lasts_until, blacklist_type) VALUES ($1, $2, $3, $4);"""
-        param = 'user' if isinstance(snowflake, discord.User) else 'guild'
-        await self.bot.pool.execute(
-            sql,
+    ) -> dict[int, BlacklistBase]:
+        if entry := self.blacklists.get(snowflake.id):
+            raise AlreadyBlacklistedError(snowflake, reason=entry['reason'], until=entry['lasts_until'])
+
+        if lasts_until:
+            lasts_until = lasts_until.astimezone(datetime.UTC)
+        param = 'guild' if isinstance(snowflake, discord.Guild) else 'user'
+        await self.bot.db.execute(
+            Queries.ADD_BLACKLIST,
             snowflake.id,
             reason,
-            lasts_until,
+            lasts_until.replace(tzinfo=None) if lasts_until else None,
             param,
         )
-        self.blacklists[snowflake] = {
+        self.blacklists[snowflake.id] = {
             'reason': reason,
             'lasts_until': lasts_until,
             'blacklist_type': param,
         }
+        (self.guilds if param == 'guild' else self.users).add(snowflake.id)
+        if lasts_until:
+            earliest = self._expiries[0][0] if self._expiries else None
+            heapq.heappush(self._expiries, (lasts_until, snowflake.id))
+            if earliest is None or lasts_until < earliest:
+                self._schedule_expiry()
         return self.blacklists
 
-    async def remove(self, snowflake: discord.User | discord.Guild) -> dict[Snowflake, BlacklistBase]:
+    async def remove(self, snowflake: discord.User | discord.Guild) -> dict[int, BlacklistBase]:
         if not self.is_blacklisted(snowflake):
-            bsql = """SELECT * FROM Blacklists WHERE snowflake = $1"""
-            check = await self.bot.pool.execute(bsql, snowflake.id)
-            if check:
-                pass
             raise NotBlacklistedError(snowflake)
 
-        sql = """DELETE FROM Blacklists WHERE snowflake = $1"""
-        await self.bot.pool.execute(
-            sql,
-            snowflake.id,
-        )
-        if snowflake in self.blacklists:
-            self.blacklists.pop(snowflake)
+        await self.bot.db.execute(Queries.REMOVE_BLACKLIST, snowflake.id)
+        self._discard(snowflake.id)
         return self.blacklists
 
+    def _discard(self, snowflake: int) -> None:
+        self.blacklists.pop(snowflake, None)
+        self.users.discard(snowflake)
+        self.guilds.discard(snowflake)
+
+    def _schedule_expiry(self) -> None:
+        if self._expiry_task:
+            self._expiry_task.cancel()
+        self._expiry_task = asyncio.create_task(self._expire()) if self._expiries else None
+
+    async def _expire(self) -> None:
+        while self._expiries:
+            lasts_until, snowflake = self._expiries[0]
+            now = datetime.datetime.now(datetime.UTC)
+            if lasts_until > now:
+                await discord.utils.sleep_until(min(lasts_until, now + MAX_SLEEP))
+                continue
+
+            heapq.heappop(self._expiries)
+            entry = self.blacklists.get(snowflake)
+            if entry is None or entry['lasts_until'] != lasts_until:
+                continue
+
+            self._discard(snowflake)
+            try:
+                await self.bot.db.execute(Queries.REMOVE_BLACKLIST, snowflake)
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                # The row is picked up again on the next startup and expires right away then.
+                self.bot.log.exception('Failed to delete the expired blacklist on %s', snowflake)
+            else:
+                self.bot.log.info('Blacklist on %s expired', snowflake)
+
+        self._expiry_task = None
+
+    def close(self) -> None:
+        if self._expiry_task:
+            self._expiry_task.cancel()
+
     def __repr__(self) -> str:
         return str(self.blacklists)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import io
+import logging
+import multiprocessing
+from typing import TYPE_CHECKING, cast
+
+import asyncpg
+from cachetools import LRUCache
+from PIL import Image
+
+from .database import Queries
+from .http import UPSTREAM_ERRORS
+
+if TYPE_CHECKING:
+    from .database import Database
+    from .http import HTTPClient
+    from .types import WaifuResult
+
+__all__ = ('ColourExtractor', 'dominant_colour')
+
+log = logging.getLogger(__name__)
+
+# Previews are already small, this only bounds the work for the odd large one.
+THUMBNAIL_SIZE = (64, 64)
+PALETTE_SIZE = 5
+
+
+def dominant_colour(data: bytes) -> int:
+    # Runs in a worker process, so it has to stay a plain top-level function.
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('RGB', THUMBNAIL_SIZE)
+        rgb = image.convert('RGB')
+    rgb.thumbnail(THUMBNAIL_SIZE)
+    quantized = rgb.quantize(colors=PALETTE_SIZE)
+    # Palette images count colours by palette index.
+    counts = cast('list[tuple[int, int]]', quantized.getcolors(PALETTE_SIZE) or [(0, 0)])
+    _, index = max(counts)
+    palette = quantized.getpalette() or [0, 0, 0]
+    red, green, blue = palette[index * 3 : index * 3 + 3]
+    return (red << 16) | (green << 8) | blue
+
+
+class ColourExtractor:
+    """
+    Works out the dominant colour of images whose upstream doesn't provide one.
+
+    Colours are computed from the preview image in a process pool and cached in memory and in ``ImageColours``.
+    """
+
+    def __init__(self, web: HTTPClient, db: Database, *, workers: int = 2, maxsize: int = 4096) -> None:
+        self.web = web
+        self.db = db
+        # Forking would copy the locks of the parent's threads, e.g. to_thread workers, possibly held.
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+        )
+        self.colours: LRUCache[tuple[str, int], int] = LRUCache(maxsize=maxsize)
+        self._pending: dict[tuple[str, int], asyncio.Task[int | None]] = {}
+
+    def get(self, source: str, image_id: int | str) -> int | None:
+        return self.colours.get((source, int(image_id)))
+
+    def extract(self, source: str, image: WaifuResult) -> None:
+        key = (source, int(image.image_id))
+        if image.dominant_color or not image.preview or key in self.colours or key in self._pending:
+            return
+
+        task = self._pending[key] = asyncio.create_task(self._extract(key, image.preview))
+        task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+    async def _compute(self, preview: str) -> int:
+        async with self.web.get('cdn', preview) as response:
+            response.raise_for_status()
+            data = await response.read()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, dominant_colour, data)
+
+    async def _extract(self, key: tuple[str, int], preview: str) -> int | None:
+        source, image_id = key
+        try:
+            colour: int | None = await self.db.fetchval(Queries.IMAGE_COLOUR, image_id, source)
+            if colour is None:
+                colour = await self._compute(preview)
+                await self.db.execute(Queries.ADD_IMAGE_COLOUR, image_id, source, colour)
+        except (*UPSTREAM_ERRORS, OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            log.debug('Could not work out the colour of %s', key, exc_info=True)
+            return None
+
+        self.colours[key] = colour
+        return colour
+
+    def close(self) -> None:
+        for task in self._pending.values():
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
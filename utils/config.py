@@ -1,11 +1,117 @@
+from __future__ import annotations
+
+import configparser
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
 import discord
 
-__ALL__ = ['BASE_PREFIX', 'OWNERS_ID', 'DESCRIPTION', 'THEME_COLOUR']
+__ALL__ = ['BASE_PREFIX', 'OWNERS_ID', 'DESCRIPTION', 'THEME_COLOUR', 'CONFIG_PATH', 'Config']
 
 BASE_PREFIX = 'm.'
 
-OWNERS_ID = [688293803613880334, 263602820496883712, 651454696208465941, 412734157819609090, 606648465065246750]
+OWNERS_ID = frozenset({688293803613880334, 263602820496883712, 651454696208465941, 412734157819609090, 606648465065246750})
 
 DESCRIPTION = """A low effort bot with a cute design."""
 
 THEME_COLOUR = discord.Colour(0x4B506F)
+
+CONFIG_PATH = Path('config.ini')
+
+
+@dataclass(frozen=True, slots=True)
+class BotConfig:
+    token: str
+    webhook: str
+    waifu: str
+
+
+@dataclass(frozen=True, slots=True)
+class DatabaseConfig:
+    user: str
+    password: str
+    database: str
+    host: str
+    port: int
+    pool_min_size: int = 2
+    pool_max_size: int = 10
+    pool_idle_timeout: float = 300.0
+    statement_timeout: float = 10.0
+
+    @property
+    def credentials(self) -> dict[str, Any]:
+        return {
+            'user': self.user,
+            'password': self.password,
+            'database': self.database,
+            'host': self.host,
+            'port': self.port,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class VotesConfig:
+    flush_interval: float = 10.0
+    # Smash or pass messages are edited at most once per interval, however fast the votes come in.
+    edit_interval: float = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class MetricsConfig:
+    host: str = '127.0.0.1'
+    # 0 leaves the metrics endpoint off.
+    port: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """
+    A parsed snapshot of ``config.ini``.
+
+    Instances are immutable, a reload builds a new one and swaps it in whole.
+    """
+
+    bot: BotConfig
+    database: DatabaseConfig
+    votes: VotesConfig
+    metrics: MetricsConfig
+    path: Path
+    mtime_ns: int
+
+    @classmethod
+    def from_file(cls, path: Path = CONFIG_PATH) -> Config:
+        # This does blocking file I/O, use asyncio.to_thread once the event loop is running.
+        mtime_ns = path.stat().st_mtime_ns
+        parser = configparser.ConfigParser()
+        with path.open(encoding='utf-8') as f:
+            parser.read_file(f)
+
+        return cls(
+            bot=BotConfig(
+                token=parser.get('bot', 'token'),
+                webhook=parser.get('bot', 'webhook'),
+                waifu=parser.get('bot', 'waifu'),
+            ),
+            database=DatabaseConfig(
+                user=parser.get('database', 'user'),
+                password=parser.get('database', 'password'),
+                database=parser.get('database', 'database'),
+                host=parser.get('database', 'host'),
+                port=parser.getint('database', 'port'),
+                pool_min_size=parser.getint('database', 'pool_min_size', fallback=2),
+                pool_max_size=parser.getint('database', 'pool_max_size', fallback=10),
+                pool_idle_timeout=parser.getfloat('database', 'pool_idle_timeout', fallback=300.0),
+                statement_timeout=parser.getfloat('database', 'statement_timeout', fallback=10.0),
+            ),
+            votes=VotesConfig(
+                flush_interval=parser.getfloat('votes', 'flush_interval', fallback=10.0),
+                edit_interval=parser.getfloat('votes', 'edit_interval', fallback=1.0),
+            ),
+            metrics=MetricsConfig(
+                host=parser.get('metrics', 'host', fallback='127.0.0.1'),
+                port=parser.getint('metrics', 'port', fallback=0),
+            ),
+            path=path,
+            mtime_ns=mtime_ns,
+        )
@@ -12,6 +12,9 @@ __all__ = ('DeContext',)
 
 
 class DeContext(commands.Context['DeBot']):
+    # Set when the command is invoked, for its latency metric.
+    started_at: float | None = None
+
     @discord.utils.copy_doc(commands.Context['DeBot'].reply)
     async def reply(self, content: str | None = None, **kwargs: Any) -> discord.Message:
         try:
@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import contextlib
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple, Self
+
+import asyncpg
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Iterable, Sequence
+
+    from asyncpg.pool import PoolConnectionProxy
+
+    from .config import DatabaseConfig
+
+__all__ = ('Database', 'PoolStats', 'Queries', 'Query')
+
+
+class Query(NamedTuple):
+    name: str
+    sql: str
+    prepare: bool = False
+
+
+class Queries:
+    """Every statement the bot sends. The ones marked ``prepare`` are prepared as soon as a pooled connection opens."""
+
+    PREFIXES = Query(
+        'prefixes',
+        """SELECT guild, array_agg(prefix) AS prefixes FROM Prefixes GROUP BY guild""",
+    )
+    ADD_PREFIX = Query(
+        'add_prefix',
+        """INSERT INTO Prefixes VALUES ($1, $2)""",
+    )
+    REMOVE_PREFIX = Query(
+        'remove_prefix',
+        """DELETE FROM Prefixes WHERE guild = $1 AND prefix = $2""",
+    )
+    CLEAR_PREFIXES = Query(
+        'clear_prefixes',
+        """DELETE FROM Prefixes WHERE guild = $1""",
+    )
+
+    BLACKLISTS = Query(
+        'blacklists',
+        """SELECT snowflake, reason, lasts_until, blacklist_type FROM Blacklists""",
+    )
+    ADD_BLACKLIST = Query(
+        'add_blacklist',
+        """INSERT INTO Blacklists (snowflake, reason, lasts_until, blacklist_type) VALUES ($1, $2, $3, $4)""",
+    )
+    REMOVE_BLACKLIST = Query(
+        'remove_blacklist',
+        """DELETE FROM Blacklists WHERE snowflake = $1""",
+    )
+
+    ADD_FAVOURITE = Query(
+        'add_favourite',
+        """
+            INSERT INTO
+                WaifuFavourites (waifu_url, user_id, nsfw, tm)
+            VALUES
+                ($1, $2, $3, NOW() AT TIME ZONE 'utc')
+        """,
+        prepare=True,
+    )
+    # Keyset pagination over waifu_favourites_user_tm_idx. waifu_url breaks ties between favourites added at the same time.
+    FAVOURITES = Query(
+        'favourites',
+        """
+            SELECT
+                waifu_url,
+                nsfw,
+                tm
+            FROM
+                WaifuFavourites
+            WHERE
+                user_id = $1
+            ORDER BY
+                tm DESC,
+                waifu_url DESC
+            LIMIT
+                $2
+        """,
+    )
+    FAVOURITES_AFTER = Query(
+        'favourites_after',
+        """
+            SELECT
+                waifu_url,
+                nsfw,
+                tm
+            FROM
+                WaifuFavourites
+            WHERE
+                user_id = $1
+                AND (tm, waifu_url) < ($3, $4)
+            ORDER BY
+                tm DESC,
+                waifu_url DESC
+            LIMIT
+                $2
+        """,
+    )
+    # The NOT nsfw predicate has to be spelled out for the planner to pick the partial waifu_favourites_user_sfw_tm_idx.
+    SFW_FAVOURITES = Query(
+        'sfw_favourites',
+        """
+            SELECT
+                waifu_url,
+                nsfw,
+                tm
+            FROM
+                WaifuFavourites
+            WHERE
+                user_id = $1
+                AND NOT nsfw
+            ORDER BY
+                tm DESC,
+                waifu_url DESC
+            LIMIT
+                $2
+        """,
+    )
+    SFW_FAVOURITES_AFTER = Query(
+        'sfw_favourites_after',
+        """
+            SELECT
+                waifu_url,
+                nsfw,
+                tm
+            FROM
+                WaifuFavourites
+            WHERE
+                user_id = $1
+                AND NOT nsfw
+                AND (tm, waifu_url) < ($3, $4)
+            ORDER BY
+                tm DESC,
+                waifu_url DESC
+            LIMIT
+                $2
+        """,
+    )
+    FLUSH_VOTES = Query(
+        'flush_votes',
+        """
+            INSERT INTO
+                Waifus (id, smashes, passes, nsfw, type)
+            SELECT
+                *
+            FROM
+                unnest($1::INTEGER[], $2::INTEGER[], $3::INTEGER[], $4::BOOLEAN[], $5::WaifuType[])
+            ON CONFLICT (id, type) DO
+            UPDATE
+            SET
+                smashes = Waifus.smashes + EXCLUDED.smashes,
+                passes = Waifus.passes + EXCLUDED.passes
+            RETURNING
+                id,
+                type,
+                nsfw,
+                smashes,
+                passes
+        """,
+        prepare=True,
+    )
+
+    CHARACTER_TAGS = Query(
+        'character_tags',
+        """SELECT name, post_count FROM CharacterTags""",
+    )
+    CHARACTER_TAGS_REFRESHED = Query(
+        'character_tags_refreshed',
+        """SELECT MAX(refreshed_at) FROM CharacterTags""",
+    )
+    UPSERT_CHARACTER_TAGS = Query(
+        'upsert_character_tags',
+        """
+            INSERT INTO
+                CharacterTags (name, post_count, refreshed_at)
+            SELECT
+                name,
+                post_count,
+                NOW() AT TIME ZONE 'utc'
+            FROM
+                unnest($1::TEXT[], $2::INTEGER[]) AS t (name, post_count)
+            ON CONFLICT (name) DO
+            UPDATE
+            SET
+                post_count = EXCLUDED.post_count,
+                refreshed_at = EXCLUDED.refreshed_at
+        """,
+    )
+
+    IMAGE_COLOUR = Query(
+        'image_colour',
+        """SELECT colour FROM ImageColours WHERE id = $1 AND type = $2""",
+        prepare=True,
+    )
+    ADD_IMAGE_COLOUR = Query(
+        'add_image_colour',
+        """INSERT INTO ImageColours (id, type, colour) VALUES ($1, $2, $3) ON CONFLICT DO NOTHING""",
+    )
+
+    SMASH_OR_PASS_MESSAGE = Query(
+        'smash_or_pass_message',
+        """
+            SELECT
+                message_id,
+                owner_id,
+                type AS source,
+                nsfw,
+                query,
+                image_id,
+                url,
+                page,
+                colour,
+                smashers,
+                passers
+            FROM
+                SmashOrPassMessages
+            WHERE
+                message_id = $1
+        """,
+        prepare=True,
+    )
+    UPSERT_SMASH_OR_PASS_MESSAGE = Query(
+        'upsert_smash_or_pass_message',
+        """
+            INSERT INTO
+                SmashOrPassMessages (
+                    message_id,
+                    owner_id,
+                    type,
+                    nsfw,
+                    query,
+                    image_id,
+                    url,
+                    page,
+                    colour,
+                    smashers,
+                    passers,
+                    updated_at
+                )
+            VALUES
+                ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, NOW() AT TIME ZONE 'utc')
+            ON CONFLICT (message_id) DO
+            UPDATE
+            SET
+                image_id = EXCLUDED.image_id,
+                url = EXCLUDED.url,
+                page = EXCLUDED.page,
+                colour = EXCLUDED.colour,
+                smashers = EXCLUDED.smashers,
+                passers = EXCLUDED.passers,
+                updated_at = EXCLUDED.updated_at
+        """,
+    )
+    PURGE_SMASH_OR_PASS_MESSAGES = Query(
+        'purge_smash_or_pass_messages',
+        """DELETE FROM SmashOrPassMessages WHERE updated_at < (NOW() AT TIME ZONE 'utc') - $1::INTERVAL""",
+    )
+
+    TOP_WAIFUS = Query(
+        'top_waifus',
+        """
+            SELECT
+                id,
+                smashes,
+                passes
+            FROM
+                Waifus
+            WHERE
+                type = $1
+                AND nsfw = $2
+            ORDER BY
+                smashes DESC,
+                id
+            LIMIT
+                $3
+        """,
+    )
+
+    @classmethod
+    def all(cls) -> list[Query]:
+        return [value for value in vars(cls).values() if isinstance(value, Query)]
+
+
+if TYPE_CHECKING:
+    _Connection = asyncpg.Connection[asyncpg.Record]
+else:
+    _Connection = asyncpg.Connection
+
+
+class DeConnection(_Connection):
+    async def prepare_cached(self, query: Query) -> None:
+        # Connection.prepare() bypasses the statement cache that execute() and fetch() look statements up in,
+        # and its statements stop working once the connection goes back to the pool. This goes through the same
+        # lookup execute() uses instead, which is private, so asyncpg is pinned to a minor version in requirements.txt.
+        await self._get_statement(query.sql, None)  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType]
+
+
+class PoolStats(NamedTuple):
+    size: int
+    idle: int
+    min_size: int
+    max_size: int
+    acquisitions: int
+    total_wait: float
+    max_wait: float
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.acquisitions if self.acquisitions else 0.0
+
+
+class Database:
+    """Runs registered queries against the pool and keeps track of how long callers wait for a connection."""
+
+    def __init__(self, pool: asyncpg.Pool[asyncpg.Record]) -> None:
+        self.pool = pool
+        self.acquisitions = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @classmethod
+    async def connect(cls, config: DatabaseConfig) -> Self:
+        pool: asyncpg.Pool[asyncpg.Record] | None = await asyncpg.create_pool(
+            **config.credentials,
+            min_size=config.pool_min_size,
+            max_size=config.pool_max_size,
+            max_inactive_connection_lifetime=config.pool_idle_timeout,
+            command_timeout=config.statement_timeout,
+            server_settings={'statement_timeout': str(int(config.statement_timeout * 1000))},
+            connection_class=DeConnection,
+            init=cls._prepare_statements,
+        )
+        if not pool or (pool and pool.is_closing()):
+            msg = 'Pool is closed'
+            raise RuntimeError(msg)
+        return cls(pool)
+
+    @staticmethod
+    async def _prepare_statements(conn: asyncpg.Connection[asyncpg.Record]) -> None:
+        if isinstance(conn, DeConnection):
+            for query in Queries.all():
+                if query.prepare:
+                    await conn.prepare_cached(query)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[PoolConnectionProxy[asyncpg.Record]]:
+        start = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            waited = time.perf_counter() - start
+            self.acquisitions += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            yield conn
+
+    async def execute(self, query: Query, *args: Any) -> str:
+        async with self.acquire() as conn:
+            return await conn.execute(query.sql, *args)
+
+    async def executemany(self, query: Query, args: Iterable[Sequence[Any]]) -> None:
+        async with self.acquire() as conn:
+            await conn.executemany(query.sql, args)
+
+    async def fetch(self, query: Query, *args: Any) -> list[asyncpg.Record]:
+        async with self.acquire() as conn:
+            return await conn.fetch(query.sql, *args)
+
+    async def fetchrow(self, query: Query, *args: Any) -> asyncpg.Record | None:
+        async with self.acquire() as conn:
+            return await conn.fetchrow(query.sql, *args)
+
+    async def fetchval(self, query: Query, *args: Any) -> Any:  # noqa: ANN401
+        async with self.acquire() as conn:
+            return await conn.fetchval(query.sql, *args)
+
+    def stats(self) -> PoolStats:
+        return PoolStats(
+            size=self.pool.get_size(),
+            idle=self.pool.get_idle_size(),
+            min_size=self.pool.get_min_size(),
+            max_size=self.pool.get_max_size(),
+            acquisitions=self.acquisitions,
+            total_wait=self.total_wait,
+            max_wait=self.max_wait,
+        )
+
+    async def close(self) -> None:
+        await self.pool.close()
@@ -15,11 +15,14 @@ __all__ = (
     'BlacklistedUserError',
     'DeBotError',
     'FeatureDisabledError',
+    'MigrationError',
     'NotBlacklistedError',
     'PrefixAlreadyPresentError',
     'PrefixNotInitialisedError',
     'PrefixNotPresentError',
     'UnderMaintenanceError',
+    'UpstreamBusyError',
+    'UpstreamUnavailableError',
 )
 
 
@@ -76,11 +79,25 @@ class NotBlacklistedError(commands.CommandError, DeBotError):
         super().__init__(f'{snowflake} is not blacklisted.')
 
 
+class MigrationError(DeBotError): ...
+
+
 class UnderMaintenanceError(commands.CheckFailure, DeBotError):
     def __init__(self) -> None:
         super().__init__('The bot is currently under maintenance.')
 
 
+class UpstreamBusyError(commands.CommandError, DeBotError):
+    def __init__(self) -> None:
+        super().__init__('Too many images are being requested right now, try again in a moment.')
+
+
+class UpstreamUnavailableError(commands.CommandError, DeBotError):
+    def __init__(self, upstream: str) -> None:
+        self.upstream = upstream
+        super().__init__(f'{upstream} is having trouble right now, try again in a bit.')
+
+
 class WaifuNotFoundError(commands.CommandError, DeBotError):
     def __init__(self, waifu: str | None = None) -> None:
         if waifu:
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import dataclasses
+import logging
+import random
+import time
+from typing import TYPE_CHECKING, Any, Literal, NamedTuple
+
+import aiohttp
+from cachetools import LRUCache
+
+from .errors import UpstreamBusyError, UpstreamUnavailableError
+from .ratelimit import FairScheduler, TokenBucket
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Sequence
+
+__all__ = ('UPSTREAMS', 'UPSTREAM_ERRORS', 'CircuitBreaker', 'HTTPClient', 'Upstream', 'UpstreamStats')
+
+log = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, TimeoutError)
+# Everything a request through HTTPClient can fail with besides a bad status.
+UPSTREAM_ERRORS = (aiohttp.ClientError, TimeoutError, UpstreamBusyError, UpstreamUnavailableError)
+# Longest Retry-After we are willing to sit through before giving up on a request.
+MAX_RETRY_AFTER = 5.0
+MIN_HEDGE_SAMPLES = 20
+MIN_HEDGE_DELAY = 0.05
+
+
+class Upstream(NamedTuple):
+    name: str
+    base_url: str
+    connections: int = 10
+    keepalive: float = 30.0
+    dns_ttl: int = 300
+    connect_timeout: float = 3.0
+    timeout: float = 10.0
+    retries: int = 2
+    backoff: float = 0.25
+    # Request budget, shared fairly between guilds and users by a FairScheduler.
+    rate: float = 5.0
+    burst: int = 10
+    max_queued: int = 100
+    queue_timeout: float = 8.0
+    # Consecutive failed requests before the circuit opens, and how long it stays open.
+    breaker_threshold: int = 5
+    breaker_reset: float = 30.0
+    # How long a hedged request waits on this upstream before trying the next, until there's a p95 to go by.
+    hedge_after: float = 1.5
+
+
+UPSTREAMS = {
+    upstream.name: upstream
+    for upstream in (
+        Upstream('waifu.im', 'https://api.waifu.im', connections=8, rate=4.0, burst=8),
+        Upstream('danbooru', 'https://danbooru.donmai.us', connections=10, timeout=8.0, rate=8.0),
+        # Autocomplete callers give up after Discord's 3 seconds anyway.
+        Upstream('safebooru', 'https://safebooru.donmai.us', timeout=5.0, retries=1, rate=8.0, queue_timeout=2.0),
+        # Image previews, only fetched in the background.
+        Upstream('cdn', 'https://cdn.donmai.us', connections=4, rate=10.0, burst=20),
+    )
+}
+
+
+class CircuitBreaker:
+    """Stops requests to an upstream after repeated failures, then lets a single request through to probe it."""
+
+    def __init__(self, *, threshold: int, reset_after: float) -> None:
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+
+    @property
+    def state(self) -> Literal['closed', 'open', 'half-open']:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_after:
+            return 'open'
+        return 'half-open'
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == 'half-open' and not self.probing:
+            self.probing = True
+            return True
+        return state == 'closed'
+
+    def release(self) -> None:
+        # The probe was cancelled or throttled before it could tell us anything.
+        self.probing = False
+
+    def record(self, *, success: bool) -> None:
+        self.probing = False
+        if success:
+            self.failures = 0
+            self.opened_at = None
+            return
+
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+def _percentile(samples: collections.deque[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _window() -> collections.deque[float]:
+    return collections.deque(maxlen=512)
+
+
+@dataclasses.dataclass(slots=True)
+class UpstreamStats:
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    # Requests that waited for the rate limit, and ones that gave up waiting.
+    throttled: int = 0
+    rejected: int = 0
+    latencies: collections.deque[float] = dataclasses.field(default_factory=_window)
+    total_latency: float = 0.0
+    # The same window per path. Endpoints of one upstream can take very different times, e.g. a page of 1000 tags.
+    path_latencies: LRUCache[str, collections.deque[float]] = dataclasses.field(
+        default_factory=lambda: LRUCache[str, collections.deque[float]](maxsize=64)
+    )
+
+    def observe(self, latency: float, path: str) -> None:
+        self.requests += 1
+        self.total_latency += latency
+        self.latencies.append(latency)
+        window = self.path_latencies.get(path)
+        if window is None:
+            window = self.path_latencies[path] = _window()
+        window.append(latency)
+
+    @property
+    def average(self) -> float:
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+    def percentile(self, fraction: float, path: str | None = None) -> float:
+        samples = self.latencies if path is None else self.path_latencies.get(path)
+        return _percentile(samples, fraction) if samples else 0.0
+
+
+class HTTPClient:
+    """
+    One session per upstream, each with its own connection pool, timeouts and retry policy.
+
+    Responses are only handed out as context managers so that their connection always goes back to the pool.
+    """
+
+    def __init__(self, upstreams: dict[str, Upstream] = UPSTREAMS) -> None:
+        self.upstreams = upstreams
+        self.sessions = {name: self._session(upstream) for name, upstream in upstreams.items()}
+        self.stats = {name: UpstreamStats() for name in upstreams}
+        self.breakers = {
+            name: CircuitBreaker(threshold=upstream.breaker_threshold, reset_after=upstream.breaker_reset)
+            for name, upstream in upstreams.items()
+        }
+        self.schedulers = {
+            name: FairScheduler(
+                TokenBucket(upstream.rate, upstream.burst),
+                max_queued=upstream.max_queued,
+                timeout=upstream.queue_timeout,
+            )
+            for name, upstream in upstreams.items()
+        }
+
+    @staticmethod
+    def _session(upstream: Upstream) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=upstream.connections,
+            keepalive_timeout=upstream.keepalive,
+            ttl_dns_cache=upstream.dns_ttl,
+        )
+        return aiohttp.ClientSession(
+            base_url=upstream.base_url,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=upstream.timeout, sock_connect=upstream.connect_timeout),
+            raise_for_status=False,
+        )
+
+    async def _acquire(self, upstream: str) -> None:
+        scheduler = self.schedulers[upstream]
+        stats = self.stats[upstream]
+        if scheduler.queued or scheduler.bucket.tokens < 1:
+            stats.throttled += 1
+        try:
+            await scheduler.acquire()
+        except UpstreamBusyError:
+            stats.rejected += 1
+            raise
+
+    def _delay(self, upstream: Upstream, attempt: int, response: aiohttp.ClientResponse | None) -> float:
+        if response is not None and (retry_after := response.headers.get('Retry-After', '')).isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        # Full jitter, so that callers which failed together don't retry together.
+        return random.uniform(0, upstream.backoff * 2**attempt)  # noqa: S311
+
+    def hedge_delay(self, upstream: str, path: str) -> float:
+        stats = self.stats[upstream]
+        if len(stats.path_latencies.get(path, ())) < MIN_HEDGE_SAMPLES:
+            return self.upstreams[upstream].hedge_after
+        return max(stats.percentile(0.95, path), MIN_HEDGE_DELAY)
+
+    async def _fetch(self, upstream: str, path: str, **kwargs: Any) -> aiohttp.ClientResponse:
+        profile = self.upstreams[upstream]
+        session = self.sessions[upstream]
+        stats = self.stats[upstream]
+        breaker = self.breakers[upstream]
+        if not breaker.allow():
+            raise UpstreamUnavailableError(upstream)
+
+        attempt = 0
+        try:
+            while True:
+                await self._acquire(upstream)
+                start = time.perf_counter()
+                try:
+                    response = await session.get(path, **kwargs)
+                except RETRY_ERRORS:
+                    stats.errors += 1
+                    if attempt >= profile.retries:
+                        raise
+                    delay = self._delay(profile, attempt, None)
+                else:
+                    stats.observe(time.perf_counter() - start, path)
+                    if response.status not in RETRY_STATUSES or attempt >= profile.retries:
+                        break
+                    stats.errors += 1
+                    delay = self._delay(profile, attempt, response)
+                    response.release()
+
+                attempt += 1
+                stats.retries += 1
+                log.debug('Retrying %s %s in %.2fs (attempt %s)', upstream, path, delay, attempt)
+                await asyncio.sleep(delay)
+        except (asyncio.CancelledError, UpstreamBusyError):
+            # Our own rate limit turned the request away, the upstream never saw it.
+            breaker.release()
+            raise
+        except RETRY_ERRORS:
+            breaker.record(success=False)
+            raise
+
+        if not response.ok:
+            stats.errors += 1
+        breaker.record(success=response.status not in RETRY_STATUSES)
+        return response
+
+    async def _hedged(self, upstreams: Sequence[str], path: str, **kwargs: Any) -> aiohttp.ClientResponse:
+        remaining = collections.deque(upstreams)
+        running: set[asyncio.Task[aiohttp.ClientResponse]] = set()
+        finished: list[asyncio.Task[aiohttp.ClientResponse]] = []
+        result: aiohttp.ClientResponse | None = None
+        try:
+            while result is None and (remaining or running):
+                timeout = None
+                if remaining:
+                    upstream = remaining.popleft()
+                    running.add(asyncio.create_task(self._fetch(upstream, path, **kwargs)))
+                    # Only wait on a host for as long as it usually takes when there's another one to try.
+                    timeout = self.hedge_delay(upstream, path) if remaining else None
+
+                done, running = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finished.extend(done)
+                for task in done:
+                    if task.exception() is None and task.result().status not in RETRY_STATUSES:
+                        result = task.result()
+                        break
+
+            if result is None:
+                # Every host failed, report the last failure.
+                result = finished[-1].result()
+            return result
+        finally:
+            for task in running:
+                task.cancel()
+            for task in finished:
+                if task.exception() is None and task.result() is not result:
+                    task.result().release()
+
+    @contextlib.asynccontextmanager
+    async def get(self, upstream: str, path: str, **kwargs: Any) -> AsyncGenerator[aiohttp.ClientResponse]:
+        response = await self._fetch(upstream, path, **kwargs)
+        try:
+            yield response
+        finally:
+            response.release()
+
+    @contextlib.asynccontextmanager
+    async def hedged_get(
+        self,
+        upstreams: Sequence[str],
+        path: str,
+        **kwargs: Any,
+    ) -> AsyncGenerator[aiohttp.ClientResponse]:
+        """
+        Send the request to the first upstream, and to the next one if the first is slower than usual or fails.
+
+        The upstreams must serve the same API, the first usable response wins.
+        """
+        response = await self._hedged(upstreams, path, **kwargs)
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def close(self) -> None:
+        await asyncio.gather(*(session.close() for session in self.sessions.values()))
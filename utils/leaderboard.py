@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+from typing import TYPE_CHECKING, NamedTuple
+
+from .database import Queries
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    import asyncpg
+
+    from .database import Database
+
+__all__ = ('WAIFU_TYPES', 'Leaderboard', 'LeaderboardEntry')
+
+# Mirrors the WaifuType enum in the database.
+WAIFU_TYPES = ('waifu', 'waifusearch', 'pokemon')
+LEADERBOARD_SIZE = 100
+
+
+class LeaderboardEntry(NamedTuple):
+    image_id: int
+    smashes: int
+    passes: int
+
+
+class Board:
+    def __init__(self, size: int) -> None:
+        self.size = size
+        # Sorted by (-smashes, image id), so the most smashed image comes first.
+        self.order: list[tuple[int, int]] = []
+        self.entries: dict[int, LeaderboardEntry] = {}
+
+    def __contains__(self, image_id: int) -> bool:
+        return image_id in self.entries
+
+    def set(self, entry: LeaderboardEntry) -> None:
+        if (old := self.entries.get(entry.image_id)) is not None:
+            del self.order[bisect.bisect_left(self.order, (-old.smashes, old.image_id))]
+            del self.entries[old.image_id]
+        elif len(self.order) >= self.size and (-entry.smashes, entry.image_id) >= self.order[-1]:
+            return
+
+        bisect.insort(self.order, (-entry.smashes, entry.image_id))
+        self.entries[entry.image_id] = entry
+        if len(self.order) > self.size:
+            _, dropped = self.order.pop()
+            del self.entries[dropped]
+
+    def top(self, limit: int) -> list[LeaderboardEntry]:
+        return [self.entries[image_id] for _, image_id in itertools.islice(self.order, limit)]
+
+
+class Leaderboard:
+    """
+    The most smashed images for every waifu type and NSFW flag, kept in memory.
+
+    Vote totals only ever go up, so the totals returned by each vote flush are enough to keep the top entries exact.
+    """
+
+    def __init__(self, db: Database, *, size: int = LEADERBOARD_SIZE) -> None:
+        self.db = db
+        self.size = size
+        self.boards = {(source, nsfw): Board(size) for source in WAIFU_TYPES for nsfw in (False, True)}
+
+    async def load(self) -> None:
+        for (source, nsfw), board in self.boards.items():
+            for record in await self.db.fetch(Queries.TOP_WAIFUS, source, nsfw, self.size):
+                board.set(LeaderboardEntry(record['id'], record['smashes'], record['passes']))
+
+    def update(self, records: Iterable[asyncpg.Record]) -> None:
+        for record in records:
+            board = self.boards[record['type'], record['nsfw']]
+            board.set(LeaderboardEntry(record['id'], record['smashes'], record['passes']))
+
+    def vote(self, image_id: int, *, source: str, nsfw: bool, smashes: int, passes: int) -> None:
+        # Images already on the board move right away, everything else waits for the flush to report its total.
+        board = self.boards[source, nsfw]
+        if (entry := board.entries.get(image_id)) is not None:
+            board.set(entry._replace(smashes=entry.smashes + smashes, passes=entry.passes + passes))
+
+    def top(self, source: str, *, nsfw: bool, limit: int = 10) -> list[LeaderboardEntry]:
+        return self.boards[source, nsfw].top(limit)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import logging.handlers
+import queue
+from typing import TYPE_CHECKING
+
+from discord.ext import tasks
+
+from .embed import Embed
+
+if TYPE_CHECKING:
+    from .webhooks import WebhookQueue
+
+__all__ = ('LogShipper',)
+
+SHIP_INTERVAL = 5.0
+QUEUE_SIZE = 1000
+# Loggers whose records are shipped, ours and discord.py's.
+SHIPPED_LOGGERS = ('discord', 'bot', 'cogs', 'utils', '__main__')
+# The webhook can't report on itself, these would only queue more records when it's failing.
+IGNORED_LOGGERS = ('discord.webhook', 'utils.webhooks')
+ENTRY_LIMIT = 1000
+DESCRIPTION_LIMIT = 4000
+
+
+def _belongs(name: str, loggers: tuple[str, ...]) -> bool:
+    return any(name == logger or name.startswith(f'{logger}.') for logger in loggers)
+
+
+class ShippedLoggers(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        return _belongs(record.name, SHIPPED_LOGGERS) and not _belongs(record.name, IGNORED_LOGGERS)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A queue handler that drops records instead of raising when its queue is full."""
+
+    def __init__(self, queue: queue.Queue[logging.LogRecord]) -> None:
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The default formats the record here, on the logging thread. The listener does that instead.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BufferingHandler(logging.Handler):
+    """Formats records on the listener thread and keeps them until the next shipment picks them up."""
+
+    def __init__(self, maxsize: int) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+        self.entries: collections.deque[str] = collections.deque()
+        self.dropped = 0
+        self.setFormatter(logging.Formatter('[{asctime}] [{levelname}] {name}: {message}', '%H:%M:%S', style='{'))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # handle() holds the lock already.
+        if len(self.entries) >= self.maxsize:
+            self.dropped += 1
+            return
+        self.entries.append(self.format(record)[:ENTRY_LIMIT])
+
+    def take(self) -> list[str]:
+        self.acquire()
+        try:
+            entries = list(self.entries)
+            self.entries.clear()
+        finally:
+            self.release()
+        return entries
+
+
+class LogShipper:
+    """
+    Sends WARNING and above records to the logger webhook in batches, without logging ever waiting on it.
+
+    Logging calls only put the record in a bounded queue. A listener thread formats them,
+    and a task on the loop hands whatever piled up to the :class:`WebhookQueue` every few seconds.
+    Records that don't fit anywhere along the way are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        webhooks: WebhookQueue,
+        *,
+        level: int = logging.WARNING,
+        interval: float = SHIP_INTERVAL,
+        maxsize: int = QUEUE_SIZE,
+    ) -> None:
+        self.webhooks = webhooks
+        self.queue: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=maxsize)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handler.setLevel(level)
+        self.handler.addFilter(ShippedLoggers())
+        self.buffer = BufferingHandler(maxsize)
+        self.listener = logging.handlers.QueueListener(self.queue, self.buffer)
+        self.shipped = 0
+        self.ship_loop.change_interval(seconds=interval)
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped + self.buffer.dropped
+
+    def _embeds(self, entries: list[str]) -> list[Embed]:
+        embeds: list[Embed] = []
+        description = ''
+        for entry in entries:
+            block = f'```\n{entry}```'
+            if description and len(description) + len(block) > DESCRIPTION_LIMIT:
+                embeds.append(Embed(title='Logs', description=description))
+                description = ''
+            description += block
+        if description:
+            embeds.append(Embed(title='Logs', description=description))
+        return embeds
+
+    def ship(self) -> None:
+        entries = self.buffer.take()
+        for embed in self._embeds(entries):
+            self.webhooks.send(embed)
+        self.shipped += len(entries)
+
+    @tasks.loop(seconds=SHIP_INTERVAL)
+    async def ship_loop(self) -> None:
+        self.ship()
+
+    def start(self) -> None:
+        self.listener.start()
+        logging.getLogger().addHandler(self.handler)
+        self.ship_loop.start()
+
+    async def close(self) -> None:
+        logging.getLogger().removeHandler(self.handler)
+        self.ship_loop.cancel()
+        # Joins the listener thread once it has formatted what's left in the queue.
+        await asyncio.to_thread(self.listener.stop)
+        self.ship()
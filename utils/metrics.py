@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import bisect
+import collections
+import logging
+import math
+from typing import TYPE_CHECKING, ClassVar, TypeVar
+
+import psutil
+from aiohttp import web
+
+from .view import BaseView
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from bot import DeBot
+
+__all__ = ('BotMetrics', 'Counter', 'Gauge', 'Histogram', 'MetricsServer', 'Registry', 'Summary')
+
+log = logging.getLogger(__name__)
+
+MetricT = TypeVar('MetricT', bound='Metric')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs: Iterable[tuple[str, str]]) -> str:
+    escaped = [f'{name}="{_escape(value)}"' for name, value in pairs]
+    return '{' + ','.join(escaped) + '}' if escaped else ''
+
+
+class Metric:
+    """A metric family in the Prometheus text format. Label values are passed positionally, in ``labels`` order."""
+
+    type: ClassVar[str]
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def _pairs(self, key: tuple[str, ...], *extra: tuple[str, str]) -> list[tuple[str, str]]:
+        return [*zip(self.labels, key, strict=True), *extra]
+
+    def samples(self) -> Iterator[tuple[str, list[tuple[str, str]], float]]:
+        for key, value in self.values.items():
+            yield self.name, self._pairs(key), value
+
+    def clear(self) -> None:
+        self.values.clear()
+
+    def render(self) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type}'
+        for name, pairs, value in self.samples():
+            yield f'{name}{_labels(pairs)} {_value(value)}'
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def set(self, value: float, *labels: str) -> None:
+        # For totals that are already counted elsewhere, e.g. UpstreamStats.
+        self.values[labels] = value
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # Label values -> (count per bucket with +Inf last, sum)
+        self.observations: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts, total = self.observations.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> Iterator[tuple[str, list[tuple[str, str]], float]]:
+        for key, (counts, total) in self.observations.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                yield f'{self.name}_bucket', self._pairs(key, ('le', _value(bound))), cumulative
+            yield f'{self.name}_sum', self._pairs(key), total[0]
+            yield f'{self.name}_count', self._pairs(key), cumulative
+
+    def clear(self) -> None:
+        self.observations.clear()
+
+
+class Summary(Metric):
+    type = 'summary'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self.summaries: dict[tuple[str, ...], tuple[dict[float, float], float, int]] = {}
+
+    def set(self, quantiles: dict[float, float], total: float, count: int, *labels: str) -> None:
+        self.summaries[labels] = (quantiles, total, count)
+
+    def samples(self) -> Iterator[tuple[str, list[tuple[str, str]], float]]:
+        for key, (quantiles, total, count) in self.summaries.items():
+            for quantile, value in quantiles.items():
+                yield self.name, self._pairs(key, ('quantile', repr(quantile))), value
+            yield f'{self.name}_sum', self._pairs(key), total
+            yield f'{self.name}_count', self._pairs(key), count
+
+    def clear(self) -> None:
+        self.summaries.clear()
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list[Metric] = []
+        # Run before every scrape to update the metrics that are read off other objects.
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: MetricT) -> MetricT:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception:
+                log.exception('Metrics collector %r failed', collector)
+        return '\n'.join(line for metric in self.metrics for line in metric.render()) + '\n'
+
+
+class BotMetrics(Registry):
+    """Everything the bot exposes on its metrics endpoint."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.commands = self.register(
+            Counter('debot_commands_total', 'Commands invoked, by command and outcome.', ('command', 'outcome')),
+        )
+        self.command_duration = self.register(
+            Histogram('debot_command_duration_seconds', 'Time from invocation to completion or error.', ('command',)),
+        )
+        self.prefix_lookups = self.register(
+            Counter(
+                'debot_prefix_cache_lookups_total',
+                'Guild prefix lookups, hit when the guild has custom prefixes cached.',
+                ('result',),
+            ),
+        )
+        self.blacklist_lookups = self.register(
+            Counter(
+                'debot_blacklist_lookups_total',
+                'Blacklist lookups before dispatching a message, hit when the author or guild is blacklisted.',
+                ('result',),
+            ),
+        )
+        self.gateway_latency = self.register(
+            Gauge('debot_gateway_latency_seconds', 'Latency between a heartbeat and its acknowledgement.'),
+        )
+        self.pool_connections = self.register(
+            Gauge('debot_pool_connections', 'Database pool connections by state.', ('state',)),
+        )
+        self.pool_max_size = self.register(Gauge('debot_pool_max_size', 'Most connections the pool may open.'))
+        self.pool_acquisitions = self.register(
+            Counter('debot_pool_acquisitions_total', 'Connections acquired from the database pool.'),
+        )
+        self.pool_wait = self.register(
+            Counter('debot_pool_wait_seconds_total', 'Time spent waiting for a pooled connection.'),
+        )
+        self.pool_max_wait = self.register(
+            Gauge('debot_pool_max_wait_seconds', 'Longest wait for a pooled connection so far.'),
+        )
+        self.upstream_latency = self.register(
+            Summary(
+                'debot_upstream_latency_seconds',
+                'Upstream response latency, quantiles over the most recent requests.',
+                ('upstream',),
+            ),
+        )
+        self.upstream_events = self.register(
+            Counter(
+                'debot_upstream_events_total',
+                'Upstream request failures, retries and rate limiting.',
+                ('upstream', 'event'),
+            ),
+        )
+        self.upstream_circuit_open = self.register(
+            Gauge('debot_upstream_circuit_open', 'Whether the circuit breaker of an upstream is not closed.', ('upstream',)),
+        )
+        self.active_views = self.register(Gauge('debot_active_views', 'Views still listening, by class.', ('view',)))
+        self.resident_memory = self.register(Gauge('debot_resident_memory_bytes', 'Resident set size of the process.'))
+        self.process = psutil.Process()
+
+    def collect(self, bot: DeBot) -> None:
+        self.gateway_latency.set(bot.latency)
+
+        if hasattr(bot, 'db'):
+            stats = bot.db.stats()
+            self.pool_connections.set(stats.size - stats.idle, 'in_use')
+            self.pool_connections.set(stats.idle, 'idle')
+            self.pool_max_size.set(stats.max_size)
+            self.pool_acquisitions.set(stats.acquisitions)
+            self.pool_wait.set(stats.total_wait)
+            self.pool_max_wait.set(stats.max_wait)
+
+        if hasattr(bot, 'web'):
+            for name, stats in bot.web.stats.items():
+                quantiles = {quantile: stats.percentile(quantile) for quantile in QUANTILES}
+                self.upstream_latency.set(quantiles, stats.total_latency, stats.requests, name)
+                for event in ('errors', 'retries', 'throttled', 'rejected'):
+                    self.upstream_events.set(getattr(stats, event), name, event)
+                self.upstream_circuit_open.set(bot.web.breakers[name].state != 'closed', name)
+
+        self.active_views.clear()
+        views = collections.Counter(type(view).__name__ for view in BaseView.active if not view.is_finished())
+        for name, count in views.items():
+            self.active_views.set(count, name)
+
+        self.resident_memory.set(self.process.memory_info().rss)
+
+
+class MetricsServer:
+    """Serves a registry at ``/metrics`` for Prometheus to scrape. Meant to listen on a local address only."""
+
+    def __init__(self, registry: Registry, *, host: str, port: int) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    async def handle(self, _: web.Request) -> web.Response:
+        return web.Response(body=self.registry.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def close(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+import asyncpg
+
+from .errors import MigrationError
+
+if TYPE_CHECKING:
+    from asyncpg.pool import PoolConnectionProxy
+
+__all__ = ('MIGRATIONS_PATH', 'Migration', 'apply_migrations', 'load_migrations')
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS_PATH = Path('migrations')
+
+MIGRATION_FILENAME = re.compile(r'(?P<version>\d+)_(?P<name>\w+)\.sql')
+
+# Statements such as CREATE INDEX CONCURRENTLY refuse to run inside a transaction block.
+# Files starting with this line are executed one statement at a time, each ending with a semicolon at the end of a line.
+NO_TRANSACTION_MARKER = '-- migrate: no-transaction'
+
+STATEMENT_END = re.compile(r';[ \t]*$', re.MULTILINE)
+
+# Arbitrary key so that two instances booting at once don't apply the same migration twice.
+MIGRATION_LOCK = 0x6D6967726174
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS SchemaMigrations (
+        version INTEGER NOT NULL PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc')
+    )
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+    checksum: str
+    transactional: bool
+
+    def __str__(self) -> str:
+        return f'{self.version:04}_{self.name}'
+
+
+def load_migrations(path: Path = MIGRATIONS_PATH) -> list[Migration]:
+    # This does blocking file I/O, use asyncio.to_thread once the event loop is running.
+    migrations: list[Migration] = []
+    for file in path.glob('*.sql'):
+        match = MIGRATION_FILENAME.fullmatch(file.name)
+        if not match:
+            msg = f'{file} is not named like <version>_<name>.sql'
+            raise MigrationError(msg)
+
+        sql = file.read_text(encoding='utf-8')
+        migrations.append(
+            Migration(
+                version=int(match['version']),
+                name=match['name'],
+                sql=sql,
+                checksum=hashlib.sha256(sql.encode()).hexdigest(),
+                transactional=not sql.startswith(NO_TRANSACTION_MARKER),
+            )
+        )
+
+    migrations.sort(key=lambda migration: migration.version)
+    return migrations
+
+
+async def _fetch_applied(
+    conn: asyncpg.Connection[asyncpg.Record] | PoolConnectionProxy[asyncpg.Record],
+) -> dict[int, str]:
+    try:
+        records = await conn.fetch("""SELECT version, checksum FROM SchemaMigrations""")
+    except asyncpg.UndefinedTableError:
+        await conn.execute(CREATE_MIGRATIONS_TABLE)
+        return {}
+    return {record['version']: record['checksum'] for record in records}
+
+
+def _pending(migrations: list[Migration], applied: dict[int, str]) -> list[Migration]:
+    pending: list[Migration] = []
+    for migration in migrations:
+        checksum = applied.get(migration.version)
+        if checksum is None:
+            pending.append(migration)
+        elif checksum != migration.checksum:
+            msg = f'Migration {migration} was edited after being applied, add a new migration instead'
+            raise MigrationError(msg)
+    return pending
+
+
+async def _record(
+    conn: asyncpg.Connection[asyncpg.Record] | PoolConnectionProxy[asyncpg.Record],
+    migration: Migration,
+) -> None:
+    await conn.execute(
+        """INSERT INTO SchemaMigrations (version, name, checksum) VALUES ($1, $2, $3)""",
+        migration.version,
+        migration.name,
+        migration.checksum,
+    )
+
+
+async def apply_migrations(
+    conn: asyncpg.Connection[asyncpg.Record] | PoolConnectionProxy[asyncpg.Record],
+    migrations: list[Migration],
+) -> list[Migration]:
+    """
+    Apply the migrations that have not been applied yet, in order.
+
+    When the schema is up to date this costs a single query.
+    """
+    if not _pending(migrations, await _fetch_applied(conn)):
+        return []
+
+    await conn.execute("""SELECT pg_advisory_lock($1)""", MIGRATION_LOCK)
+    try:
+        # Another instance may have applied some of them while we waited on the lock.
+        pending = _pending(migrations, await _fetch_applied(conn))
+        for migration in pending:
+            log.info('Applying migration %s', migration)
+            if migration.transactional:
+                async with conn.transaction():
+                    await conn.execute(migration.sql)
+                    await _record(conn, migration)
+            else:
+                # Postgres wraps a multi-statement query string in a transaction block, so send them one by one.
+                for statement in STATEMENT_END.split(migration.sql):
+                    if statement.strip():
+                        await conn.execute(statement)
+                await _record(conn, migration)
+    finally:
+        await conn.execute("""SELECT pg_advisory_unlock($1)""", MIGRATION_LOCK)
+
+    return pending
@@ -1 +1,117 @@
-# TODO(Depreca1ed): Rewrite all  # noqa: FIX002, TD003
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Generic, Self, TypeVar
+
+import discord
+
+from .view import BaseView
+
+if TYPE_CHECKING:
+    from bot import DeBot
+
+    from .context import DeContext
+
+__all__ = ('KeysetPaginator',)
+
+EntryT = TypeVar('EntryT')
+KeyT = TypeVar('KeyT')
+
+
+class KeysetPaginator(BaseView, Generic[EntryT, KeyT]):
+    """
+    Pages through a query with keyset pagination, so every page costs the same however deep it is.
+
+    Subclasses fetch the entries after a key and render a page. Visited pages are kept for going back,
+    and the next page is fetched while the user is still reading the current one.
+    """
+
+    message: discord.Message
+    ctx: DeContext
+
+    def __init__(self, *, per_page: int = 10, for_user: int, timeout: float = 300.0) -> None:
+        super().__init__(timeout=timeout)
+        self.per_page = per_page
+        self.for_user = for_user
+        self.pages: list[list[EntryT]] = []
+        self.index = 0
+        self.has_next = False
+        self._next_page: asyncio.Task[list[EntryT]] | None = None
+
+    async def fetch(self, after: KeyT | None, limit: int) -> list[EntryT]:
+        raise NotImplementedError
+
+    def key(self, entry: EntryT) -> KeyT:
+        raise NotImplementedError
+
+    def format_page(self, entries: list[EntryT]) -> discord.Embed:
+        raise NotImplementedError
+
+    async def start(self, ctx: DeContext) -> bool:
+        self.ctx = ctx
+        first = await self._fetch_page(None)
+        if not first:
+            return False
+
+        self.pages.append(first)
+        self._update()
+        self.message = await ctx.reply(embed=self.format_page(first[: self.per_page]), view=self)
+        return True
+
+    async def _fetch_page(self, after: KeyT | None) -> list[EntryT]:
+        # One extra row tells us whether there is a page after this one without a COUNT.
+        return await self.fetch(after, self.per_page + 1)
+
+    def _update(self) -> None:
+        page = self.pages[self.index]
+        self.has_next = self.index + 1 < len(self.pages) or len(page) > self.per_page
+
+        self.first_page.disabled = self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = not self.has_next
+        self.counter.label = str(self.index + 1)
+
+        if self.index + 1 == len(self.pages) and self.has_next and self._next_page is None:
+            self._next_page = asyncio.create_task(self._fetch_page(self.key(page[self.per_page - 1])))
+
+    async def _show(self, interaction: discord.Interaction[DeBot]) -> None:
+        self._update()
+        await interaction.response.edit_message(embed=self.format_page(self.pages[self.index][: self.per_page]), view=self)
+
+    @discord.ui.button(emoji='⏮️', style=discord.ButtonStyle.grey)
+    async def first_page(self, interaction: discord.Interaction[DeBot], _: discord.ui.Button[Self]) -> None:
+        self.index = 0
+        await self._show(interaction)
+
+    @discord.ui.button(emoji='◀️', style=discord.ButtonStyle.grey)
+    async def previous_page(self, interaction: discord.Interaction[DeBot], _: discord.ui.Button[Self]) -> None:
+        self.index = max(self.index - 1, 0)
+        await self._show(interaction)
+
+    @discord.ui.button(label='1', style=discord.ButtonStyle.blurple, disabled=True)
+    async def counter(self, _: discord.Interaction[DeBot], __: discord.ui.Button[Self]) -> None: ...
+
+    @discord.ui.button(emoji='▶️', style=discord.ButtonStyle.grey)
+    async def next_page(self, interaction: discord.Interaction[DeBot], _: discord.ui.Button[Self]) -> None:
+        if self.index + 1 == len(self.pages):
+            if self._next_page is None:
+                await interaction.response.defer()
+                return
+            task, self._next_page = self._next_page, None
+            # Usually finished already, it was started when the current page was shown.
+            if page := await task:
+                self.pages.append(page)
+                self.index += 1
+        else:
+            self.index += 1
+        await self._show(interaction)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.for_user:
+            await interaction.response.send_message('This is not your menu.', ephemeral=True)
+            return False
+        return True
+
+    def stop(self) -> None:
+        if self._next_page:
+            self._next_page.cancel()
+        super().stop()
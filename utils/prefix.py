@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+__all__ = ('PrefixMatcher',)
+
+
+class _Node:
+    __slots__ = ('children', 'terminal')
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.terminal: bool = False
+
+
+class PrefixMatcher:
+    """
+    A casefolded trie of command prefixes.
+
+    Matching walks the message one character at a time, so its cost is bound by the
+    length of the longest prefix rather than by how many prefixes there are.
+    """
+
+    __slots__ = ('_root', 'prefixes')
+
+    def __init__(self, prefixes: Iterable[str] = ()) -> None:
+        self._root = _Node()
+        self.prefixes: tuple[str, ...] = tuple(dict.fromkeys(prefixes))
+        for prefix in self.prefixes:
+            node = self._root
+            for char in prefix:
+                node = node.children.setdefault(char.casefold(), _Node())
+            node.terminal = True
+
+    def match(self, content: str) -> str | None:
+        """Return the longest prefix ``content`` starts with, in the casing it was typed in."""
+        node = self._root
+        matched = 0
+        for index, char in enumerate(content):
+            child = node.children.get(char.casefold())
+            if child is None:
+                break
+            node = child
+            if node.terminal:
+                matched = index + 1
+        return content[:matched] if matched else None
+
+    def extend(self, prefixes: Iterable[str]) -> PrefixMatcher:
+        return PrefixMatcher((*self.prefixes, *prefixes))
+
+    def __contains__(self, prefix: str) -> bool:
+        return self.match(prefix) == prefix
+
+    def __repr__(self) -> str:
+        return f'<PrefixMatcher prefixes={self.prefixes!r}>'
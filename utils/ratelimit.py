@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextvars
+import time
+
+from .errors import UpstreamBusyError
+
+__all__ = ('FairScheduler', 'TokenBucket', 'bind_requester')
+
+# (guild ID or 0 in DMs, user ID) of whoever the current task is doing upstream requests for.
+# Tasks copy the context they were created in, so background refills are billed to the user that triggered them.
+_requester: contextvars.ContextVar[tuple[int, int]] = contextvars.ContextVar('requester', default=(0, 0))
+
+
+def bind_requester(guild_id: int | None, user_id: int) -> None:
+    _requester.set((guild_id or 0, user_id))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take a token if one is available.
+
+        Returns how long to wait before trying again, ``0`` meaning the token was taken.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FairScheduler:
+    """
+    Hands out a token bucket's tokens round-robin, first across guilds and then across users within a guild.
+
+    Callers over budget wait in a bounded queue and get :class:`UpstreamBusyError` if it's full or their deadline passes.
+    """
+
+    def __init__(self, bucket: TokenBucket, *, max_queued: int, timeout: float) -> None:
+        self.bucket = bucket
+        self.max_queued = max_queued
+        self.timeout = timeout
+        # Guild -> user -> waiters. Dicts keep insertion order, so moving a key to the end rotates it.
+        self.queues: dict[int, dict[int, collections.deque[asyncio.Future[None]]]] = {}
+        self.queued = 0
+        self._dispatcher: asyncio.Task[None] | None = None
+
+    async def acquire(self) -> None:
+        if not self.queued and not self.bucket.take():
+            return
+        if self.queued >= self.max_queued:
+            raise UpstreamBusyError
+
+        guild, user = _requester.get()
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(guild, {}).setdefault(user, collections.deque()).append(waiter)
+        self.queued += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except TimeoutError:
+            raise UpstreamBusyError from None
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                self._discard(guild, user, waiter)
+
+    def _discard(self, guild: int, user: int, waiter: asyncio.Future[None]) -> None:
+        users = self.queues.get(guild, {})
+        waiters = users.get(user)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        self.queued -= 1
+        if not waiters:
+            del users[user]
+        if not users:
+            self.queues.pop(guild, None)
+
+    def _next_waiter(self) -> asyncio.Future[None] | None:
+        while self.queues:
+            guild, users = next(iter(self.queues.items()))
+            user, waiters = next(iter(users.items()))
+            waiter = waiters.popleft()
+            self.queued -= 1
+
+            del users[user]
+            if waiters:
+                users[user] = waiters
+            del self.queues[guild]
+            if users:
+                self.queues[guild] = users
+
+            # Waiters that timed out are removed by acquire(), but it may not have run yet.
+            if not waiter.done():
+                return waiter
+        return None
+
+    async def _dispatch(self) -> None:
+        while self.queues:
+            if delay := self.bucket.take():
+                await asyncio.sleep(delay)
+                continue
+
+            if (waiter := self._next_waiter()) is None:
+                self.bucket.tokens += 1
+                return
+            waiter.set_result(None)
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import datetime
+import hashlib
+import logging
+import traceback
+from typing import TYPE_CHECKING
+
+import aiohttp
+import mystbin
+from cachetools import LRUCache
+from discord.ext import tasks
+
+from .embed import Embed
+from .helper_functions import better_string
+
+if TYPE_CHECKING:
+    import discord
+
+    from .webhooks import WebhookQueue
+
+__all__ = ('ErrorGroup', 'ErrorReporter', 'fingerprint')
+
+log = logging.getLogger(__name__)
+
+DIGEST_INTERVAL = 60.0
+# Tracebacks longer than this are pasted to mystbin, the embed only shows their tail.
+CHAR_LIMIT = 2000
+# Distinct errors kept per digest, anything past that is only counted.
+MAX_GROUPS = 50
+MAX_ORIGINS = 5
+SUMMARY_LIMIT = 4000
+
+
+def fingerprint(error: BaseException) -> str:
+    """
+    Identify an error by its type and the frames it went through, including the errors it was raised from.
+
+    Messages are left out since they often contain IDs or URLs that differ every time the same bug fires.
+    """
+    parts: list[str] = []
+    seen: set[int] = set()
+    current: BaseException | None = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        parts.append(f'{type(current).__module__}.{type(current).__qualname__}')
+        frames = traceback.extract_tb(current.__traceback__)
+        parts.extend(f'{frame.filename}:{frame.name}:{frame.lineno}' for frame in frames)
+        current = current.__cause__ or (None if current.__suppress_context__ else current.__context__)
+    return hashlib.blake2b('\n'.join(parts).encode(), digest_size=6).hexdigest()
+
+
+@dataclasses.dataclass(slots=True)
+class ErrorGroup:
+    fingerprint: str
+    name: str
+    traceback: str
+    # Who ran into it first, e.g. the user and server.
+    context: str | None
+    first_seen: datetime.datetime
+    count: int = 0
+    origins: collections.Counter[str] = dataclasses.field(default_factory=collections.Counter[str])
+
+    def where(self) -> str:
+        return better_string(
+            (f'{origin} ({count})' for origin, count in self.origins.most_common(MAX_ORIGINS)),
+            seperator=', ',
+        )
+
+
+class ErrorReporter:
+    """
+    Groups errors by :func:`fingerprint` and sends one digest per interval instead of a message per error.
+
+    The first digest a group shows up in carries its traceback, pasted to mystbin once if it's too long.
+    After that the group is only counted.
+    """
+
+    def __init__(self, webhooks: WebhookQueue, mystbin_cli: mystbin.Client, *, interval: float = DIGEST_INTERVAL) -> None:
+        self.webhooks = webhooks
+        self.mystbin_cli = mystbin_cli
+        # Errors since the last digest.
+        self.groups: dict[str, ErrorGroup] = {}
+        self.overflow = 0
+        # Fingerprints that were already sent with their traceback, and their paste if they needed one.
+        self.reported: LRUCache[str, str | None] = LRUCache(maxsize=1024)
+        self.digest_loop.change_interval(seconds=interval)
+
+    def report(self, error: BaseException, *, origin: str, context: str | None = None) -> str:
+        """
+        Count an error towards the next digest. Never waits on anything, so it's safe to call from any handler.
+
+        Returns the error's fingerprint.
+        """
+        key = fingerprint(error)
+        group = self.groups.get(key)
+        if group is None:
+            if len(self.groups) >= MAX_GROUPS:
+                self.overflow += 1
+                return key
+            group = self.groups[key] = ErrorGroup(
+                key,
+                type(error).__name__,
+                ''.join(traceback.format_exception(error)),
+                context,
+                datetime.datetime.now(tz=datetime.UTC),
+            )
+        group.count += 1
+        group.origins[origin] += 1
+        return key
+
+    async def _paste(self, group: ErrorGroup) -> str | None:
+        if len(group.traceback) <= CHAR_LIMIT:
+            return None
+        try:
+            paste = await self.mystbin_cli.create_paste(files=[mystbin.File(filename='error', content=group.traceback)])
+        except (aiohttp.ClientError, mystbin.APIException, TimeoutError):
+            log.warning('Could not paste the traceback of error %s', group.fingerprint)
+            return None
+        return paste.url
+
+    def _embed(self, group: ErrorGroup, paste: str | None) -> discord.Embed:
+        embed = Embed(
+            title=group.name,
+            description=f'```py\n{group.traceback[-CHAR_LIMIT:]}```',
+            url=paste,
+            colour=0x000000,
+            timestamp=group.first_seen,
+        )
+        embed.add_field(
+            value=better_string(
+                [
+                    f'> - **Fingerprint: **`{group.fingerprint}`',
+                    f'> - **Occurrences: **{group.count}',
+                    f'> - **Where: **{group.where()}',
+                    group.context,
+                ],
+                seperator='\n',
+            ),
+        )
+        return embed
+
+    def _summary(self, groups: list[ErrorGroup]) -> discord.Embed:
+        lines = [
+            f'- `{group.fingerprint}` **{group.name}** x{group.count} in {group.where()}'
+            + (f' [traceback](<{paste}>)' if (paste := self.reported.get(group.fingerprint)) else '')
+            for group in groups
+        ]
+        if self.overflow:
+            lines.append(f'- {self.overflow} more error(s) that did not fit in this digest')
+
+        description = ''
+        for line in lines:
+            if len(description) + len(line) > SUMMARY_LIMIT:
+                break
+            description += line + '\n'
+        return Embed(title='Recurring errors', description=description, colour=0x000000)
+
+    async def digest(self) -> None:
+        if not self.groups and not self.overflow:
+            return
+
+        groups, self.groups = self.groups, {}
+        repeats: list[ErrorGroup] = []
+        for group in sorted(groups.values(), key=lambda group: group.count, reverse=True):
+            if group.fingerprint in self.reported:
+                repeats.append(group)
+                continue
+            paste = self.reported[group.fingerprint] = await self._paste(group)
+            self.webhooks.send(self._embed(group, paste))
+
+        if repeats or self.overflow:
+            self.webhooks.send(self._summary(repeats))
+            self.overflow = 0
+
+    @tasks.loop(seconds=DIGEST_INTERVAL)
+    async def digest_loop(self) -> None:
+        await self.digest()
+
+    def start(self) -> None:
+        self.digest_loop.start()
+
+    async def close(self) -> None:
+        self.digest_loop.cancel()
+        await self.digest()
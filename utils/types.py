@@ -16,3 +16,4 @@ class WaifuResult(NamedTuple):
     image_id: str | int
     source: str | None
     url: str
+    preview: str | None = None
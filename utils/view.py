@@ -1,26 +1,29 @@
 from __future__ import annotations
 
 import contextlib
-import traceback
-from typing import TYPE_CHECKING, Any
+import weakref
+from typing import TYPE_CHECKING, Any, ClassVar
 
 import discord
-import mystbin
 
-from utils import Embed, better_string
+from utils import better_string
 
 if TYPE_CHECKING:
     from discord.ui.item import Item
 
     from bot import DeBot
 
-__all__ = ('BaseView',)
-
-CHAR_LIMIT = 2000
+__all__ = ('BaseView', 'report_interaction_error')
 
 
 class BaseView(discord.ui.View):
     message: discord.Message
+    # Every view that hasn't been garbage collected yet, for the metrics endpoint.
+    active: ClassVar[weakref.WeakSet[BaseView]] = weakref.WeakSet()
+
+    def __init__(self, *, timeout: float | None = 180.0) -> None:
+        super().__init__(timeout=timeout)
+        BaseView.active.add(self)
 
     async def on_timeout(self) -> None:
         with contextlib.suppress(discord.errors.NotFound):
@@ -34,33 +37,22 @@ class BaseView(discord.ui.View):
         error: Exception,
         _: Item[Any],
     ) -> None:
-        func = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
-        await func(content=str(error) + '\n-# Developers have been informed')
-        exc = f"```py\n{''.join(traceback.format_exception(type(error), error, error.__traceback__))}```"
-        exc_link = (
-            await interaction.client.mystbin_cli.create_paste(
-                files=[
-                    mystbin.File(filename='error', content=exc),
-                ],
-            )
-            if len(exc) > CHAR_LIMIT
-            else None
-        )
-
-        embed = Embed(
-            title=error.__class__.__name__,
-            description=exc,
-            url=exc_link,
-            colour=0x000000,
-        )
-        embed.add_field(
-            value=better_string(
-                [
-                    f'> - **User: **{interaction.user!s}',
-                    f"> - **Server: **{interaction.guild.name if interaction.guild else 'No guild'!s}",
-                    f'> - **View: **{self.__class__.__name__}',
-                ],
-                seperator='\n',
-            ),
-        )
-        return await interaction.client.logger_webhook.send(embed=embed)
+        await report_interaction_error(interaction, error, origin=f'View {self.__class__.__name__}')
+
+
+async def report_interaction_error(interaction: discord.Interaction[DeBot], error: Exception, *, origin: str) -> None:
+    """Report an error raised while handling a component interaction and let the user know."""
+    # Reported first, answering may fail too if the interaction expired.
+    interaction.client.errors.report(
+        error,
+        origin=origin,
+        context=better_string(
+            [
+                f'> - **User: **{interaction.user!s}',
+                f"> - **Server: **{interaction.guild.name if interaction.guild else 'No guild'!s}",
+            ],
+            seperator='\n',
+        ),
+    )
+    func = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+    await func(content=str(error) + '\n-# Developers have been informed')
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+import asyncpg
+from discord.ext import tasks
+
+from .database import Queries
+
+if TYPE_CHECKING:
+    from .database import Database
+    from .leaderboard import Leaderboard
+
+__all__ = ('VoteBuffer',)
+
+log = logging.getLogger(__name__)
+
+
+class VoteBuffer:
+    """
+    Collects smash/pass votes in memory and writes them to ``Waifus`` in one batched upsert.
+
+    A hard crash loses at most one flush interval of votes, a clean shutdown loses none.
+    """
+
+    def __init__(self, db: Database, leaderboard: Leaderboard, *, interval: float) -> None:
+        self.db = db
+        self.leaderboard = leaderboard
+        # (image id, waifu type) -> [smashes, passes, nsfw]
+        self.pending: dict[tuple[int, str], list[int]] = {}
+        # Held for the whole upsert, so that close() can wait for one in flight instead of cancelling it.
+        self._lock = asyncio.Lock()
+        self.flush_loop.change_interval(seconds=interval)
+
+    def add(self, image_id: int | str, *, source: str, nsfw: bool, smashes: int = 0, passes: int = 0) -> None:
+        counts = self.pending.setdefault((int(image_id), source), [0, 0, nsfw])
+        counts[0] += smashes
+        counts[1] += passes
+        self.leaderboard.vote(int(image_id), source=source, nsfw=nsfw, smashes=smashes, passes=passes)
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self.pending:
+                return 0
+
+            pending, self.pending = self.pending, {}
+            keys = sorted(pending)
+            try:
+                totals = await self.db.fetch(
+                    Queries.FLUSH_VOTES,
+                    [image_id for image_id, _ in keys],
+                    [pending[key][0] for key in keys],
+                    [pending[key][1] for key in keys],
+                    [bool(pending[key][2]) for key in keys],
+                    [source for _, source in keys],
+                )
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                # Put the votes back so the next flush retries them along with anything cast in the meantime.
+                for key, (smashes, passes, nsfw) in pending.items():
+                    counts = self.pending.setdefault(key, [0, 0, nsfw])
+                    counts[0] += smashes
+                    counts[1] += passes
+                raise
+            self.leaderboard.update(totals)
+            return len(keys)
+
+    @tasks.loop(seconds=10)
+    async def flush_loop(self) -> None:
+        try:
+            await self.flush()
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            log.exception('Failed to flush %s pending vote rows, retrying on the next tick', len(self.pending))
+
+    def start(self) -> None:
+        self.flush_loop.start()
+
+    async def close(self) -> None:
+        # The loop can only be waiting for its next tick or for the lock here, never halfway through an upsert.
+        async with self._lock:
+            self.flush_loop.cancel()
+        try:
+            await self.flush()
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            log.exception('Dropping %s pending vote rows on shutdown', len(self.pending))
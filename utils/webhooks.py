@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+from typing import TYPE_CHECKING
+
+import aiohttp
+import discord
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+__all__ = ('WebhookQueue',)
+
+log = logging.getLogger(__name__)
+
+# Discord's limits for a single message.
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+QUEUE_SIZE = 500
+# How long shutdown waits for queued embeds to go out.
+CLOSE_TIMEOUT = 5.0
+
+
+class WebhookQueue:
+    """
+    Sends embeds to a webhook from a background task, packing as many as fit into each message.
+
+    Nothing that queues an embed ever waits on Discord. When the queue is full new embeds are dropped and counted.
+    """
+
+    def __init__(self, webhook: Callable[[], discord.Webhook], *, maxsize: int = QUEUE_SIZE) -> None:
+        # A callable so that a webhook URL changed by a config reload is picked up.
+        self.webhook = webhook
+        self.maxsize = maxsize
+        self.pending: collections.deque[discord.Embed] = collections.deque()
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._sender: asyncio.Task[None] | None = None
+
+    def send(self, embed: discord.Embed) -> bool:
+        if self.closed or len(self.pending) >= self.maxsize:
+            self.dropped += 1
+            return False
+        self.pending.append(embed)
+        self._wakeup.set()
+        return True
+
+    def _batch(self) -> list[discord.Embed]:
+        batch = [self.pending.popleft()]
+        size = len(batch[0])
+        while self.pending and len(batch) < MAX_EMBEDS and size + len(self.pending[0]) <= MAX_EMBED_CHARS:
+            embed = self.pending.popleft()
+            batch.append(embed)
+            size += len(embed)
+        return batch
+
+    async def _send(self) -> None:
+        while self.pending or not self.closed:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            batch = self._batch()
+            try:
+                await self.webhook().send(embeds=batch)
+            except (discord.HTTPException, aiohttp.ClientError, TimeoutError):
+                # Errors are reported through this queue, so this one can only be logged.
+                log.warning('Could not send %s embed(s) to the webhook', len(batch))
+            else:
+                self.sent += len(batch)
+
+    def start(self) -> None:
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._send())
+
+    async def close(self) -> None:
+        # Whatever was queued before shutdown still gets a chance to go out.
+        self.closed = True
+        self._wakeup.set()
+        if self._sender is None:
+            return
+        try:
+            await asyncio.wait_for(self._sender, CLOSE_TIMEOUT)
+        except TimeoutError:
+            log.warning('Dropping %s embed(s) that were not sent before shutdown', len(self.pending))